@@ -1,26 +1,115 @@
-import requests
+from utils import http
 import os
 import random
-import json
+import threading
+import time
 from urllib.parse import quote_plus
 
-API_KEY = os.environ["GOOGLE_API_KEY"]
-CITIES_PATH = "data/countries+cities.json"
+from restcountries_utils import code_for_name
+from utils.citystore import get_store
+from utils.state import load_json, save_json
+
+
+WIKI_API = "https://en.wikipedia.org/w/api.php"
+EXTRACTS_BATCH = 20  # max intro extracts per query
+# Trivia is remembered across runs: a month for found articles, a week for misses
+TRIVIA_FILE = "wikipedia_trivia.json"
+TRIVIA_TTL = 30 * 24 * 3600
+TRIVIA_MISSING_TTL = 7 * 24 * 3600
+_trivia = None
+_trivia_lock = threading.Lock()
+
+def _api_key():
+    # Read lazily so importing this module works without the key
+    return os.environ["GOOGLE_API_KEY"]
+
+def _load_trivia():
+    global _trivia
+    if _trivia is None:
+        _trivia = load_json(TRIVIA_FILE, {})
+    return _trivia
+
+def _fresh(entry):
+    fetched, extract = entry
+    ttl = TRIVIA_TTL if extract else TRIVIA_MISSING_TTL
+    return time.time() - fetched < ttl
+
+def _fetch_extracts(titles):
+    # One MediaWiki query for up to EXTRACTS_BATCH titles; returns {title: extract or None}
+    res = http.get(WIKI_API, params={
+        "action": "query",
+        "prop": "extracts|pageprops",
+        "exintro": 1,
+        "explaintext": 1,
+        "exlimit": EXTRACTS_BATCH,
+        "ppprop": "disambiguation",
+        "redirects": 1,
+        "titles": "|".join(titles),
+        "format": "json",
+        "formatversion": "2",
+    }, timeout=5)
+    res.raise_for_status()
+    query = res.json().get("query", {})
+    normalized = {n["from"]: n["to"] for n in query.get("normalized", [])}
+    redirects = {r["from"]: r["to"] for r in query.get("redirects", [])}
+    pages = {p["title"]: p for p in query.get("pages", [])}
+
+    extracts = {}
+    for title in titles:
+        target = normalized.get(title, title)
+        page = pages.get(redirects.get(target, target), {})
+        extract = page.get("extract") or ""
+        if page.get("missing") or "disambiguation" in page.get("pageprops", {}):
+            extract = ""
+        # Keep just the first paragraph, like the page summary card
+        extracts[title] = extract.strip().split("\n")[0] or None
+    return extracts
+
+def get_wikipedia_summaries(titles):
+    """
+    Returns {title: first paragraph of its English Wikipedia article, or None}.
+    Titles are looked up EXTRACTS_BATCH per request, and results (including
+    misses) are remembered in the state directory across runs.
+    """
+    titles = list(dict.fromkeys(titles))
+    with _trivia_lock:
+        cache = _load_trivia()
+        pending = [t for t in titles if t not in cache or not _fresh(cache[t])]
+
+    for i in range(0, len(pending), EXTRACTS_BATCH):
+        batch = pending[i:i + EXTRACTS_BATCH]
+        try:
+            extracts = _fetch_extracts(batch)
+        except Exception as e:
+            print(f"[WIKI] {len(batch)} titles → {e}")
+            continue
+        with _trivia_lock:
+            for title, extract in extracts.items():
+                cache[title] = [time.time(), extract]
+
+    with _trivia_lock:
+        if pending:
+            for title in [t for t, entry in cache.items() if not _fresh(entry)]:
+                del cache[title]
+            save_json(TRIVIA_FILE, cache)
+        return {t: cache[t][1] if t in cache else None for t in titles}
 
 def get_wikipedia_summary(title):
-    try:
-        res = requests.get(f"https://en.wikipedia.org/api/rest_v1/page/summary/{title.replace(' ', '_')}", timeout=3)
-        if res.status_code == 200:
-            data = res.json()
-            return data.get("extract")
-    except Exception as e:
-        print(f"[WIKI] {title} → {e}")
-    return None
+    return get_wikipedia_summaries([title]).get(title)
 
-def get_random_tourist_photos(country_name, max_photos=5, max_results=50):
+def add_trivia(photos):
+    """Fills in the "trivia" of the selected photo entries, with one batched lookup."""
+    pending = [p for p in photos if "trivia_title" in p]
+    summaries = get_wikipedia_summaries([p["trivia_title"] for p in pending]) if pending else {}
+    for p in pending:
+        p["trivia"] = summaries.get(p.pop("trivia_title"))
+    return photos
+
+def get_random_tourist_photos(country_name, max_photos=5, max_results=50, with_trivia=True):
     """
     Fetch up to `max_photos` random tourist spot photos from top `max_results` Google Places results.
-    Includes Wikipedia trivia if available.
+    Includes Wikipedia trivia if available (with_trivia=False leaves a
+    "trivia_title" for add_trivia instead, so callers can batch it).
     """
     search_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
     photo_url_template = "https://maps.googleapis.com/maps/api/place/photo"
@@ -35,7 +124,7 @@ def get_random_tourist_photos(country_name, max_photos=5, max_results=50):
     ]
     query = random.choice(query_templates).format(country_name)
 
-    res = requests.get(search_url, params={"query": query, "key": API_KEY})
+    res = http.get(search_url, params={"query": query, "key": _api_key()})
     if res.status_code != 200:
         print(f"[PLACES] Query failed: {res.status_code}")
         return []
@@ -60,29 +149,29 @@ def get_random_tourist_photos(country_name, max_photos=5, max_results=50):
             f"&query={query}&query_place_id={place_id}"
             if place_id else None
         )
-        trivia = get_wikipedia_summary(name)
 
         for photo in place.get("photos", []):
             ref = photo.get("photo_reference")
             if ref:
-                image_url = f"{photo_url_template}?maxwidth=1600&photoreference={ref}&key={API_KEY}"
+                image_url = f"{photo_url_template}?maxwidth=1600&photoreference={ref}&key={_api_key()}"
                 selected_photos.append({
                     "image_url": image_url,
                     "place_name": name,
                     "address": address,
-                    "trivia": trivia,
+                    "trivia_title": name,
                     "maps_url": maps_url
                 })
                 break  # one photo per place
         if len(selected_photos) >= max_photos:
             break
 
-    return selected_photos
+    return add_trivia(selected_photos) if with_trivia else selected_photos
 
-def get_random_city_photos(country_name, max_photos=5, max_results=50):
+def get_random_city_photos(country_name, max_photos=5, max_results=50, with_trivia=True):
     """
     Fetch up to `max_photos` random city or town photos from within the given country.
-    Includes Wikipedia trivia if available.
+    Includes Wikipedia trivia if available (with_trivia=False leaves a
+    "trivia_title" for add_trivia instead, so callers can batch it).
     """
     search_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
     photo_url_template = "https://maps.googleapis.com/maps/api/place/photo"
@@ -96,7 +185,7 @@ def get_random_city_photos(country_name, max_photos=5, max_results=50):
     ]
     query = random.choice(query_templates).format(country_name)
 
-    res = requests.get(search_url, params={"query": query, "key": API_KEY})
+    res = http.get(search_url, params={"query": query, "key": _api_key()})
     if res.status_code != 200:
         print(f"[PLACES] City query failed: {res.status_code}")
         return []
@@ -120,31 +209,30 @@ def get_random_city_photos(country_name, max_photos=5, max_results=50):
             f"&query={query}&query_place_id={place_id}"
             if place_id else None
         )
-        trivia = get_wikipedia_summary(f"{name}, {country_name}")
 
         for photo in place.get("photos", []):
             ref = photo.get("photo_reference")
             if ref:
-                image_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=1600&photoreference={ref}&key={API_KEY}"
+                image_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=1600&photoreference={ref}&key={_api_key()}"
                 selected_photos.append({
                     "image_url": image_url,
                     "place_name": name,
                     "address": address,
-                    "trivia": trivia,
+                    "trivia_title": f"{name}, {country_name}",
                     "maps_url": maps_url
                 })
                 break  # one photo per city/town
         if len(selected_photos) >= max_photos:
             break
 
-    return selected_photos
+    return add_trivia(selected_photos) if with_trivia else selected_photos
 
 def get_random_restaurant_for_country(country_name):
     """
     Choose a random city in the country and return a random restaurant with photo, rating, and map link.
     """
     # Step 1: Pick a random city
-    city_photos = get_random_city_photos(country_name, max_photos=1)
+    city_photos = get_random_city_photos(country_name, max_photos=1, with_trivia=False)
     if not city_photos:
         return None
 
@@ -154,10 +242,10 @@ def get_random_restaurant_for_country(country_name):
     search_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
     params = {
         "query": f"restaurant in {city_name}, {country_name}",
-        "key": API_KEY
+        "key": _api_key()
     }
 
-    res = requests.get(search_url, params=params)
+    res = http.get(search_url, params=params)
     results = res.json().get("results", [])
     if not results:
         return None
@@ -181,7 +269,7 @@ def get_random_restaurant_for_country(country_name):
         photo_ref = place["photos"][0]["photo_reference"]
         photo_url = (
             f"https://maps.googleapis.com/maps/api/place/photo"
-            f"?maxwidth=1600&photoreference={photo_ref}&key={API_KEY}"
+            f"?maxwidth=1600&photoreference={photo_ref}&key={_api_key()}"
         )
 
         return {
@@ -195,16 +283,17 @@ def get_random_restaurant_for_country(country_name):
 
     return None
 
-def get_city_photos_from_name(country_name, city_name, max_photos=3):
+def get_city_photos_from_name(country_name, city_name, max_photos=3, with_trivia=True):
     """
     Search for photo(s) of a specific city by name within the given country.
-    Returns up to `max_photos`, including image URLs and trivia.
+    Returns up to `max_photos`, including image URLs and trivia (see
+    get_random_tourist_photos for `with_trivia`).
     """
     search_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
     photo_url_template = "https://maps.googleapis.com/maps/api/place/photo"
 
     query = f"{city_name}, {country_name}"
-    res = requests.get(search_url, params={"query": query, "key": API_KEY})
+    res = http.get(search_url, params={"query": query, "key": _api_key()})
 
     if res.status_code != 200:
         print(f"[PLACES] City lookup failed: {res.status_code}")
@@ -225,35 +314,31 @@ def get_city_photos_from_name(country_name, city_name, max_photos=3):
             f"&query={quote_plus(name)}&query_place_id={place_id}"
             if place_id else None
         )
-        trivia = get_wikipedia_summary(f"{name}, {country_name}")
 
         for photo in place.get("photos", []):
             ref = photo.get("photo_reference")
             if ref:
-                image_url = f"{photo_url_template}?maxwidth=1600&photoreference={ref}&key={API_KEY}"
+                image_url = f"{photo_url_template}?maxwidth=1600&photoreference={ref}&key={_api_key()}"
                 selected_photos.append({
                     "image_url": image_url,
                     "place_name": name,
                     "address": address,
-                    "trivia": trivia,
+                    "trivia_title": f"{name}, {country_name}",
                     "maps_url": maps_url
                 })
                 if len(selected_photos) >= max_photos:
-                    return selected_photos
-
-    return selected_photos
+                    return add_trivia(selected_photos) if with_trivia else selected_photos
 
-def _load_city_data():
-    with open("data/countries+cities.json", encoding="utf-8") as f:
-        return json.load(f)
+    return add_trivia(selected_photos) if with_trivia else selected_photos
 
 def get_random_cities_for_country(country_name, max_results=1):
-    city_data = _load_city_data()
-    for entry in city_data:
-        if entry["name"].lower() == country_name.lower():
-            cities = entry.get("cities", [])
-            if not cities:
-                return None
-            sample = random.sample(cities, min(max_results, len(cities)))
-            return sample[0] if max_results == 1 else sample
-    return None
+    store = get_store()
+    cities = store.sample(country_name, max_results)
+    if cities is None:
+        # Names the cities file spells differently (e.g. "Czechia") can still
+        # be matched through their ISO code
+        cc = code_for_name(country_name)
+        cities = store.sample(cc, max_results) if cc else None
+    if not cities:
+        return None
+    return cities[0] if max_results == 1 else cities
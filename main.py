@@ -1,42 +1,201 @@
 import os
+import sys
 import importlib.util
-from telegram_utils import send_telegram_message
+import registry
+from telegram_utils import send_telegram_message, broadcast, pack_messages, get_chat_ids
+from utils import httpcache, metrics
+from utils.outbox import Outbox
+from utils.delivery import BackgroundDelivery, NoContent
+from utils.scheduler import run_jobs
 
 MODULES_DIR = "modules"
-messages = []
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", "4"))
+# Wall-clock seconds a module's generate() may run before it is abandoned,
+# unless its registry entry sets its own deadline.
+MODULE_DEADLINE = float(os.environ.get("MODULE_DEADLINE", "300"))
+# Bulletin order. Each module's output is sent as soon as it is ready, but a
+# listed module is held back until the ones before it have been sent or have
+# failed. Unlisted modules go out as soon as they finish.
+# Set ORDERED_DELIVERY=0 to send everything as-ready.
+DELIVERY_ORDER = [
+    "random_country",
+    "random_bird",
+    "random_song",
+    "random_panelinha",
+    "random_image",
+]
+ORDERED_DELIVERY = os.environ.get("ORDERED_DELIVERY", "1") != "0"
+# Digest mode: text outputs of modules flagged "digest" in the registry are
+# merged into as few messages as possible, sent once all of them are done.
+DIGEST = os.environ.get("DIGEST", "0") == "1"
+# Outputs and per-chat delivery progress are kept in an outbox keyed by the
+# run date (RUN_DATE, default today in UTC). Re-running on the same date only
+# delivers what's still pending. OUTBOX=0 always regenerates and resends.
+USE_OUTBOX = os.environ.get("OUTBOX", "1") != "0"
+
 errors = []
+jobs = []
+outcomes = {}
+stored = {}
+# Modules that raised NoContent: their notice is sent but not tracked
+notices = set()
+
+metrics.start()
+outbox = Outbox(os.environ.get("RUN_DATE")) if USE_OUTBOX else None
+# The digest is stored as the packed messages, with the modules they hold
+stored_digest = outbox.get_output("digest") if outbox and DIGEST else None
+digested = set(stored_digest["modules"]) if stored_digest else set()
+
+# `python main.py random_song random_bird` runs just those modules, due or not
+if sys.argv[1:]:
+    try:
+        entries = [registry.get_entry(name) for name in sys.argv[1:]]
+    except KeyError as e:
+        known = ", ".join(entry["name"] for entry in registry.MODULES)
+        sys.exit(f"{e.args[0]}\nKnown modules: {known}")
+else:
+    entries = [entry for entry in registry.MODULES if registry.is_due(entry)]
+
+for entry in entries:
+    module_name = entry["name"]
+    module_path = os.path.join(MODULES_DIR, f"{module_name}.py")
+
+    if module_name in digested:
+        print(f"[{module_name}] already in the digest for {outbox.run_date}")
+        continue
+
+    if outbox:
+        output = outbox.get_output(module_name)
+        if output is not None:
+            print(f"[{module_name}] already generated for {outbox.run_date}, reusing it")
+            stored[module_name] = output
+            continue
+
+    missing = registry.missing_capabilities(entry)
+    if missing:
+        error_msg = f"[{module_name}] skipped, missing: {', '.join(missing)}"
+        print(error_msg)
+        errors.append(error_msg)
+        continue
+
+    try:
+        spec = importlib.util.spec_from_file_location(module_name, module_path)
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+
+        if hasattr(mod, "generate"):
+            deadline = entry.get("deadline", MODULE_DEADLINE)
+            jobs.append((module_name, metrics.measure(module_name, mod.generate), deadline))
+    except Exception as e:
+        error_msg = f"[{module_name}] import failed:\n{str(e)}"
+        print(error_msg)
+        errors.append(error_msg)
+
+def send_output(module_name, output):
+    if not output:
+        return
+    try:
+        if outbox and module_name not in notices:
+            start = outbox.progress(module_name, get_chat_ids())
+            on_sent = lambda chat_id, sent: outbox.mark_sent(module_name, chat_id, sent)
+            broadcast(output, start=start, on_sent=on_sent)
+        else:
+            broadcast(output)
+    except Exception as e:
+        error_msg = f"[{module_name}] delivery failed:\n{str(e)}"
+        print(error_msg)
+        errors.append(error_msg)
+
+job_names = [name for name, _, _ in jobs] + list(stored)
+if stored_digest:
+    job_names.append("digest")
+order = [name for name in DELIVERY_ORDER if name in job_names] if ORDERED_DELIVERY else []
+# Sending happens on its own thread, so finished jobs never wait on Telegram
+# before the next ones are started
+delivery = BackgroundDelivery(send_output, order)
+
+# Once a digest has been stored, the digest modules it lacks are sent on their own
+digest_names = [
+    e["name"] for e in entries
+    if DIGEST and not stored_digest and e.get("digest") and e["name"] in job_names
+]
+digest_pending = set(digest_names)
+digest_parts = {}
+
+def resolve_digest(module_name, result=None):
+    """Holds digest modules' texts back until the last of them is done."""
+    digest_pending.discard(module_name)
+    if isinstance(result, str) and result:
+        digest_parts[module_name] = result
+    elif result:
+        delivery.ready(module_name, result)
+    if not digest_pending and digest_parts:
+        names = [name for name in digest_names if name in digest_parts]
+        messages = pack_messages([digest_parts[name] for name in names])
+        # Delivery progress counts messages, so keep the packing it refers to
+        if outbox:
+            outbox.save_output("digest", {"modules": names, "messages": messages})
+        delivery.ready("digest", messages)
+        digest_parts.clear()
+
+def module_ready(module_name, result):
+    if module_name in digest_pending:
+        resolve_digest(module_name, result)
+    else:
+        delivery.ready(module_name, result)
+
+# Outputs kept from an earlier run today only need delivering
+for module_name in [e["name"] for e in entries if e["name"] in stored]:
+    module_ready(module_name, stored[module_name])
+if stored_digest:
+    delivery.ready("digest", stored_digest["messages"])
+
+for module_name, result, error, elapsed in run_jobs(jobs, max_workers=MAX_WORKERS):
+    if error is None:
+        print(f"[{module_name}] done in {elapsed:.1f}s")
+        outcomes[module_name] = ("ok", elapsed)
+        if outbox and result:
+            outbox.save_output(module_name, result)
+        if module_name in digest_pending:
+            resolve_digest(module_name, result)
+        else:
+            delivery.ready(module_name, result)
+        continue
+
+    if isinstance(error, NoContent):
+        # Nothing today: send the module's notice in its place, untracked
+        print(f"[{module_name}] no content: {error}")
+        outcomes[module_name] = ("empty", elapsed)
+        notices.add(module_name)
+        delivery.ready(module_name, str(error))
+        if module_name in digest_pending:
+            resolve_digest(module_name)
+        continue
+
+    if isinstance(error, TimeoutError):
+        outcomes[module_name] = ("timeout", elapsed)
+        error_msg = f"[{module_name}] generate() timed out:\n{str(error)}"
+    else:
+        outcomes[module_name] = ("error", elapsed)
+        error_msg = f"[{module_name}] generate() failed:\n{str(error)}"
+    print(error_msg)
+    errors.append(error_msg)
+    if module_name in digest_pending:
+        resolve_digest(module_name)
+    else:
+        delivery.failed(module_name)
+
+delivery.close()
+
+try:
+    metrics.save_run(outcomes)
+except Exception as e:
+    print(f"[METRICS] Failed to save run: {e}")
 
-for filename in os.listdir(MODULES_DIR):
-    if filename.endswith(".py"):
-    #if filename in ["random_song.py"]:
-        module_name = filename[:-3]
-        module_path = os.path.join(MODULES_DIR, filename)
-
-        try:
-            spec = importlib.util.spec_from_file_location(module_name, module_path)
-            mod = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(mod)
-
-            if hasattr(mod, "generate"):
-                try:
-                    result = mod.generate()
-                    if result:
-                        messages.append(result)
-                except Exception as e:
-                    error_msg = f"[{module_name}] generate() failed:\n{str(e)}"
-                    print(error_msg)
-                    errors.append(error_msg)
-        except Exception as e:
-            error_msg = f"[{module_name}] import failed:\n{str(e)}"
-            print(error_msg)
-            errors.append(error_msg)
-
-# Send successful messages
-for msg in messages:
-    send_telegram_message(msg)
+if httpcache.get_cache():
+    print(httpcache.get_cache().summary())
 
 # Send error summaries
 if errors:
     error_report = "\n\n".join(errors)
     send_telegram_message(f"⚠️ Some modules failed:\n\n{error_report}")
-    
@@ -0,0 +1,87 @@
+"""
+Builds per-country artist shards (see utils/artistindex.py) by paging
+through MusicBrainz in browse mode, and regenerates
+data/full_country_artist_counts.csv from the artist totals it sees.
+
+Each indexed artist costs one more request (its releases, to flag whether
+it has any and whether one has a front cover), and MusicBrainz allows
+1 req/s, so use --limit to cap the artists indexed per country. Artists
+are indexed in browse order, which is stable between runs.
+
+Usage (from the repo root):
+    python misc/build_artist_index.py [--countries BR,PT] [--limit 200]
+"""
+import argparse
+import csv
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from musicbrainz_utils import area_for_country, artist_release_summary, browse_artists
+from utils.artistindex import HAS_COVER, HAS_RELEASES, INDEX_DIR, shard_path, write
+
+COUNTS_PATH = "data/full_country_artist_counts.csv"
+PAGE_SIZE = 100
+
+def read_counts(path=COUNTS_PATH):
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+def write_counts(rows, path=COUNTS_PATH):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["Country", "Code", "ArtistCount"], lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
+
+def index_country(country_code, limit):
+    """Returns (artist total in MusicBrainz, indexed artists with flags)."""
+    area_id = area_for_country(country_code)
+    if not area_id:
+        return 0, []
+
+    artists, total = [], None
+    offset = 0
+    while total is None or offset < min(total, limit):
+        page, total = browse_artists(area_id, limit=min(PAGE_SIZE, limit - offset), offset=offset)
+        if not page:
+            break
+        artists += page
+        offset += len(page)
+
+    for artist in artists:
+        has_releases, has_cover = artist_release_summary(artist["id"])
+        artist["flags"] = (HAS_RELEASES if has_releases else 0) | (HAS_COVER if has_cover else 0)
+    return total or 0, artists
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--countries", help="comma-separated ISO alpha-2 codes (default: every country in the counts CSV)")
+    parser.add_argument("--limit", type=int, default=200, help="max artists indexed per country")
+    args = parser.parse_args()
+
+    rows = read_counts()
+    wanted = {c.strip().upper() for c in args.countries.split(",")} if args.countries else None
+    os.makedirs(INDEX_DIR, exist_ok=True)
+
+    for row in rows:
+        cc = row["Code"].upper()
+        if not cc or (wanted and cc not in wanted):
+            continue
+        try:
+            total, artists = index_country(cc, args.limit)
+        except Exception as e:
+            print(f"[{cc}] failed: {e}")
+            continue
+        row["ArtistCount"] = total
+        if artists:
+            write(artists, shard_path(cc))
+        good = sum(1 for a in artists if a["flags"] & HAS_COVER)
+        print(f"[{cc}] {total} artists, indexed {len(artists)} ({good} with a cover)")
+        # Saved after every country so an interrupted build keeps its progress
+        write_counts(rows)
+
+if __name__ == "__main__":
+    main()
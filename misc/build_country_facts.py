@@ -0,0 +1,21 @@
+"""
+Rebuilds data/country_facts.json: population (and its date), head of state
+(name, office, portrait) and government type for every country, from one
+bulk Wikidata SPARQL query. random_country reads this snapshot instead of
+querying Wikipedia and Wikidata on every run.
+
+Usage (from the repo root):
+    python misc/build_country_facts.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.snapshot import save
+from wiki_utils import COUNTRY_FACTS_PATH, build_country_facts
+
+if __name__ == "__main__":
+    facts = build_country_facts()
+    save(facts, COUNTRY_FACTS_PATH)
+    print(f"Wrote facts for {len(facts['countries'])} countries to {COUNTRY_FACTS_PATH}")
@@ -0,0 +1,20 @@
+"""
+Rebuilds data/restcountries.json from restcountries.com /v3.1/all, keeping
+only the fields random_country uses. random_country samples and reads
+countries from this snapshot instead of calling the API on every run.
+
+Usage (from the repo root):
+    python misc/build_restcountries.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from restcountries_utils import RESTCOUNTRIES_PATH, build_restcountries
+from utils.snapshot import save
+
+if __name__ == "__main__":
+    data = build_restcountries()
+    save(data, RESTCOUNTRIES_PATH)
+    print(f"Wrote {len(data['countries'])} countries to {RESTCOUNTRIES_PATH}")
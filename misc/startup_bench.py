@@ -0,0 +1,93 @@
+"""
+Measures the cold-start import cost of every registered module with
+`python -X importtime` and appends the results to the state directory, so
+regressions in startup time show up run over run.
+
+Usage (from the repo root):
+    python misc/startup_bench.py [module ...]
+"""
+import datetime
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import registry
+from utils.state import state_path
+
+HISTORY_FILE = "startup_bench.jsonl"
+MARKER = "--bench-start--"
+
+# Loads one module the same way main.py does. Anything imported before the
+# marker is interpreter/loader overhead and is left out of the measurement.
+LOADER = f"""
+import importlib.util, sys
+spec = importlib.util.spec_from_file_location({{name!r}}, "modules/{{name}}.py")
+mod = importlib.util.module_from_spec(spec)
+print({MARKER!r}, file=sys.stderr, flush=True)
+spec.loader.exec_module(mod)
+"""
+
+def measure(name):
+    """
+    Returns (total_us, top) for importing modules/<name>.py in a fresh
+    interpreter, where `top` lists the five most expensive top-level imports.
+    Returns None if the module fails to import.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", LOADER.format(name=name)],
+        capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        print(f"[BENCH] {name} failed to import:\n{proc.stderr.strip().splitlines()[-1]}")
+        return None
+
+    lines = proc.stderr.splitlines()
+    if MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1:]
+
+    top = []
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, package = [x for x in line[len("import time:"):].split("|")]
+        if cumulative.strip().isdigit() and not package.startswith("  "):
+            # Only top-level entries, their children are already included
+            top.append((package.strip(), int(cumulative)))
+
+    top.sort(key=lambda x: -x[1])
+    return sum(us for _, us in top), top[:5]
+
+def load_previous():
+    previous = {}
+    path = state_path(HISTORY_FILE)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                previous[record["module"]] = record
+    return previous
+
+def main(names):
+    previous = load_previous()
+    now = datetime.datetime.utcnow().isoformat(timespec="seconds")
+
+    with open(state_path(HISTORY_FILE), "a", encoding="utf-8") as f:
+        for name in names:
+            measured = measure(name)
+            if measured is None:
+                continue
+            total_us, top = measured
+            before = previous.get(name, {}).get("total_us")
+            delta = f"{(total_us - before) / 1000:+8.1f} ms" if before is not None else ""
+            heaviest = ", ".join(f"{pkg} {us / 1000:.0f}ms" for pkg, us in top[:3])
+            print(f"{name:<20} {total_us / 1000:8.1f} ms {delta:>12}   {heaviest}")
+
+            record = {"ts": now, "module": name, "total_us": total_us, "top": top}
+            f.write(json.dumps(record) + "\n")
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    main(sys.argv[1:] or [entry["name"] for entry in registry.MODULES])
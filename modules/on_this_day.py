@@ -1,6 +1,7 @@
-import requests
+from utils import http
 import random
 from datetime import datetime
+from utils.delivery import NoContent
 
 def fetch_event():
     today = datetime.utcnow()
@@ -10,7 +11,7 @@ def fetch_event():
     url = f"https://en.wikipedia.org/api/rest_v1/feed/onthisday/events/{month}/{day}"
 
     try:
-        res = requests.get(url, headers={"User-Agent": "DailyBot/1.0"})
+        res = http.get(url)
         if res.status_code != 200:
             print(f"[HISTORY] API failed: {res.status_code}", flush=True)
             return None
@@ -30,4 +31,6 @@ def fetch_event():
 
 def generate():
     result = fetch_event()
-    return result or "⚠️ Não consegui encontrar um evento histórico hoje."
+    if not result:
+        raise NoContent("⚠️ Não consegui encontrar um evento histórico hoje.")
+    return result
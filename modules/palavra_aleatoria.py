@@ -1,65 +1,134 @@
-import requests
-import random
-from bs4 import BeautifulSoup
-from utils.retry import try_with_retries
+from utils import http
+import os
+import re
+import threading
+from utils.state import load_json, save_json, state_path
+from utils.wordindex import WordIndex, build, read_frequency_list
+from utils.retry import RetryError, check_status, retry
 
 WORDS_URL = "https://raw.githubusercontent.com/hermitdave/FrequencyWords/master/content/2018/pt/pt_full.txt"
-word_list = []
+WORD_INDEX = state_path("pt_words.idx")
+# Frequency band to draw from: the most common words are too plain and the
+# long tail is mostly typos and names
+SKIP_TOP = 1000
+MAX_RANK = 60000
+word_index = None
+word_index_lock = threading.Lock()
 
-def load_word_list():
-    global word_list
-    if word_list:
-        return
-    try:
-        res = requests.get(WORDS_URL)
-        words = [line.split()[0] for line in res.text.splitlines() if line]
-        word_list = [w for w in words if w.isalpha() and len(w) > 3]
-        print(f"[PT] Loaded {len(word_list)} words.", flush=True)
-    except Exception as e:
-        print(f"[PT] Failed to load word list: {e}", flush=True)
-        word_list = []
+API_URL = "https://pt.wiktionary.org/w/api.php"
+BATCH_SIZE = 50  # max titles per query for regular API clients
+# Words known to have no page (or no usable Portuguese definition), skipped when drawing
+MISSING_FILE = "wiktionary_missing.json"
+missing_words = None
 
-def get_random_word():
-    if not word_list:
-        return None
-    return random.choice(word_list)
+def load_word_index():
+    global word_index
+    with word_index_lock:
+        if word_index is None:
+            word_index = _load_word_index()
+        return word_index
 
-def fetch_definition_pt():
-    load_word_list()
-    word = get_random_word()
-    if not word:
-        return None
-
-    print(f"[PT] Trying word: {word}", flush=True)
+def _load_word_index():
+    # The list is downloaded and packed once; later runs just map the file
+    if not os.path.exists(WORD_INDEX):
+        try:
+            res = http.get(WORDS_URL)
+            res.raise_for_status()
+            words = read_frequency_list(res.text.splitlines(), keep=lambda w: w.isalpha() and len(w) > 3)
+            count = build(words, WORD_INDEX)
+            print(f"[PT] Built word index with {count} words.", flush=True)
+        except Exception as e:
+            print(f"[PT] Failed to build word index: {e}", flush=True)
+            return None
+    return WordIndex(WORD_INDEX)
 
-    url = f"https://pt.wiktionary.org/wiki/{word}"
-    headers = {"User-Agent": "Mozilla/5.0"}
+def get_random_words(k):
+    index = load_word_index()
+    if not index:
+        return []
+    return index.sample(k, skip_top=SKIP_TOP, max_rank=MAX_RANK)
 
-    try:
-        res = requests.get(url, headers=headers)
-        if res.status_code != 200:
-            print(f"[PT] Page not found: {url}", flush=True)
-            return None
+def load_missing_words():
+    global missing_words
+    if missing_words is None:
+        missing_words = set(load_json(MISSING_FILE, []))
+    return missing_words
 
-        soup = BeautifulSoup(res.text, "html.parser")
+def clean_wikitext(text):
+    text = re.sub(r"<ref[^>]*/>|<ref[^>]*>.*?</ref>", "", text)
+    text = re.sub(r"<[^>]+>", "", text)
+    # Templates go before links, since they may contain link markup
+    while re.search(r"\{\{[^{}]*\}\}", text):
+        text = re.sub(r"\{\{[^{}]*\}\}", "", text)
+    text = re.sub(r"\[\[(?:[^|\]]*\|)?([^\]]*)\]\]", r"\1", text)
+    text = text.replace("'''", "").replace("''", "")
+    return re.sub(r"\s+", " ", text).strip(" :;,")
 
-        # Find first paragraph after first section heading
-        content_div = soup.find("div", {"id": "mw-content-text"})
-        paragraphs = content_div.find_all("p")
+def extract_definition(wikitext):
+    """Returns the first usable definition in the Portuguese section of a page's wikitext, or None."""
+    section = re.split(r"^=\s*\{\{-pt-\}\}\s*=\s*$", wikitext, maxsplit=1, flags=re.M)
+    if len(section) < 2:
+        return None
+    # The section ends at the next language heading
+    section = re.split(r"^=\s*\{\{-[\w-]+-\}\}\s*=\s*$", section[1], maxsplit=1, flags=re.M)[0]
 
-        for p in paragraphs:
-            text = p.get_text(strip=True)
-            if text and len(text) > 20:
-                return f"📖 **Palavra do Dia:** {word}\n__Definição__: {text}"
+    for line in section.splitlines():
+        # "#" lines are senses; "#:" / "#*" are examples and quotations
+        if not line.startswith("#") or line[1:2] in (":", "*", "#"):
+            continue
+        text = clean_wikitext(line[1:])
+        if len(text) > 20:
+            return text
+    return None
 
-        print(f"[PT] No good definition found on page.", flush=True)
+def fetch_definition_pt():
+    missing = load_missing_words()
+    words = [w for w in get_random_words(BATCH_SIZE * 2) if w not in missing][:BATCH_SIZE]
+    if not words:
         return None
 
-    except Exception as e:
-        print(f"[PT] Exception fetching page: {e}", flush=True)
+    print(f"[PT] Trying {len(words)} words", flush=True)
+    res = check_status(http.get(API_URL, params={
+        "action": "query",
+        "prop": "revisions",
+        "rvprop": "content",
+        "rvslots": "main",
+        "titles": "|".join(words),
+        "format": "json",
+        "formatversion": "2",
+    }))
+    if res.status_code != 200:
+        print(f"[PT] Query failed: HTTP {res.status_code}", flush=True)
         return None
+    query = res.json().get("query", {})
+    titles = {n["to"]: n["from"] for n in query.get("normalized", [])}
 
-def generate():
-    result = try_with_retries(fetch_definition_pt, attempts=1, delay=5)
-    return result or None #"⚠️ Não foi possível encontrar uma definição hoje."
+    definitions = {}
+    for page in query.get("pages", []):
+        word = titles.get(page["title"], page["title"])
+        if page.get("missing") or page.get("invalid"):
+            missing.add(word)
+            continue
+        wikitext = page["revisions"][0]["slots"]["main"]["content"]
+        definition = extract_definition(wikitext)
+        if definition:
+            definitions[word] = definition
+        else:
+            # Has a page, but no Portuguese sense we can use
+            missing.add(word)
+    save_json(MISSING_FILE, sorted(missing))
 
+    # Keep the original draw order, so the pick stays uniformly random
+    for word in words:
+        if word in definitions:
+            return f"📖 **Palavra do Dia:** {word}\n__Definição__: {definitions[word]}"
+    print("[PT] No usable definition in this batch.", flush=True)
+    return None
+
+def generate():
+    # One batched query nearly always finds a word; retry with a fresh batch if not
+    try:
+        return retry(fetch_definition_pt, attempts=3, budget=30, breaker="pt.wiktionary.org")
+    except RetryError as e:
+        print(f"[PT] {e}", flush=True)
+        return None #"⚠️ Não foi possível encontrar uma definição hoje."
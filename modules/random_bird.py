@@ -1,18 +1,39 @@
-import requests
+from utils import http
 from bs4 import BeautifulSoup
-import random
 import os
+import random
 import re
 import time
-from telegram_utils import send_image_message, send_telegram_message, send_telegram_audio
 from wiki_utils import get_image_from_wikidata
-from utils.retry import try_with_retries
+from utils.retry import retry, check_status, RetryError, RETRY_ON
+from utils.delivery import NoContent
+from utils.state import state_path
+
+# Recordings live in the state directory so a resumed run (which reuses the
+# stored output) can still send them. Older ones are pruned.
+AUDIO_DIR = "xeno"
+AUDIO_KEEP_DAYS = 3
+
+def audio_path(codigo):
+    return os.path.join(state_path(AUDIO_DIR), f"{codigo}.mp3")
+
+def _prune_audio():
+    directory = state_path(AUDIO_DIR)
+    cutoff = time.time() - AUDIO_KEEP_DAYS * 24 * 3600
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
 
 def save_mp3_xeno(codigo):
     url = f"https://xeno-canto.org/{codigo}/download"
-    req = requests.get(url)
-    with open(f"./xeno/{codigo}.mp3", 'wb') as f:
+    req = check_status(http.get(url))
+    os.makedirs(state_path(AUDIO_DIR), exist_ok=True)
+    _prune_audio()
+    path = audio_path(codigo)
+    with open(f"{path}.tmp", 'wb') as f:
         f.write(req.content)
+    os.replace(f"{path}.tmp", path)
 
 def get_xeno():
     headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36 Edg/138.0.0.0',
@@ -20,23 +41,29 @@ def get_xeno():
            'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6'}
 
 
-    req = requests.get("https://xeno-canto.org/explore/random", headers=headers)
+    req = check_status(http.get("https://xeno-canto.org/explore/random", headers=headers))
     recordings = list(set(re.findall("(?<=XC)[0-9]+",req.text)))
     random_record = random.choice(recordings)
     print(random_record)
     save_mp3_xeno(random_record)
 
     url = f"https://xeno-canto.org/{random_record}"
-    req = requests.get(url, headers=headers)
+    req = check_status(http.get(url, headers=headers))
     
     link_especie = re.findall("https\:\/\/xeno-canto\.org\/species\/[A-Za-z0-9-]+",req.text)[0]
-    req2 = requests.get(link_especie, headers=headers)
+    req2 = check_status(http.get(link_especie, headers=headers))
     return req.text, req2.text, random_record
 
 def generate():
-    req_text, req2_text, random_record = try_with_retries(get_xeno, attempts=5, delay=3)
-    if req_text is None:
-        return "⚠️ Não foi possível achar um pássaro hoje."
+    try:
+        # A random recording can lack a species link, so IndexError is retried too
+        req_text, req2_text, random_record = retry(
+            get_xeno, attempts=5, base_delay=2, budget=120,
+            retry_on=RETRY_ON + (IndexError,), breaker="xeno-canto.org"
+        )
+    except RetryError as e:
+        print(f"[XENO] {e}: {e.last}")
+        raise NoContent("⚠️ Não foi possível achar um pássaro hoje.")
 
     soup = BeautifulSoup(req_text, "html.parser")
     features = [x.text for x in soup.find("table", {'class': "key-value"}).find_all('tr')]
@@ -59,6 +86,7 @@ def generate():
     nome_origem = soup2.find_all("span", {'class': "authority"})[0].text.strip()
     
     wikidata_id = 0
+    image_url = None
     try:
         wikidata_id = [x.get('href').split('/')[-1] for x in soup2.find_all("a") if 'wikidata' in x.get('href')]
         if wikidata_id:
@@ -76,17 +104,11 @@ def generate():
         f"{print_features}"
     )
 
-    chat_ids = os.environ["CHAT_IDS"].split(",")
-
+    items = []
     if image_url:
-        for chat_id in chat_ids:
-            chat_id = chat_id.strip()
-            send_image_message(chat_id, image_url, full_text)
+        items.append({"type": "photo", "url": image_url, "caption": full_text})
     else:
-        send_telegram_message(full_text)
-    
-    time.sleep(1.5)  # ✅ Ensure image arrives first
-    link_audio = str(random_record)+".mp3"
-    send_telegram_audio(link_audio, "xeno")
+        items.append({"type": "text", "text": full_text})
+    items.append({"type": "audio", "path": audio_path(random_record)})
 
-    return None
+    return items
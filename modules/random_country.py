@@ -1,39 +1,37 @@
-import pandas as pd
-import requests
-import random
-import os
-from telegram_utils import send_image_message
+from utils import datasets
+from utils.sampling import UnseenSampler, make_rng
+from utils.delivery import NoContent
 from google_places_utils import (
     get_random_tourist_photos,
     get_random_city_photos,
     get_random_restaurant_for_country,
     get_random_cities_for_country,
-    get_city_photos_from_name
+    get_city_photos_from_name,
+    add_trivia
 )
+from restcountries_utils import get_country, known_codes
 from wiki_utils import get_country_data
 
 def load_random_country_alpha2_code():
     path = "data/country_codes.csv"
-    df = pd.read_csv(path)
-    cc = df.sample(n=1).iloc[0]["alpha-2"].lower()
+    codes = datasets.load(path).column("alpha-2").tolist()
+    # Codes restcountries doesn't know would only waste the run
+    known = known_codes()
+    if known:
+        codes = [c for c in codes if c in known]
+    # No country repeats until all of them have come up
+    cc = codes[UnseenSampler("countries", [1] * len(codes)).draw(make_rng())].lower()
     
     return cc
 
-def get_api_url(cc):
-    return f"https://restcountries.com/v3.1/alpha/{cc}"
-
 def fetch_country():
     try:
         cc = load_random_country_alpha2_code()
-        API_URL = get_api_url(cc)
-        res = requests.get(API_URL, timeout=10)
-        if res.status_code != 200:
-            print(f"[COUNTRY] API failed: {res.status_code}", flush=True)
+        country = get_country(cc)
+        if not country:
+            print(f"[COUNTRY] Unknown country code: {cc}", flush=True)
             return None, None, None
 
-        countries = res.json()
-        country = random.choice(countries)
-
         # ─── 1) Country names ────────────────────────────────────────────
         name = country.get("name", {}).get("common", "Desconhecido")
 
@@ -66,7 +64,7 @@ def fetch_country():
         flag_url = country.get("flags", {}).get("png")
 
         # ─── 4) Wiki data (unchanged) ────────────────────────────────────
-        additional_wiki_data = get_country_data(name)
+        additional_wiki_data = get_country_data(name, cc=cc)
         head_of_state = additional_wiki_data.get("head_of_state")
         title         = additional_wiki_data.get("stateTitle")
         head_url      = additional_wiki_data.get("stateImage")
@@ -105,21 +103,19 @@ def generate():
     flag_url, head_url, caption = fetch_country()
 
     if not flag_url or not caption:
-        # We couldn’t get three valid values, so return an error message
-        return "⚠️ Não foi possível carregar o país do dia."
-
-    chat_ids = os.environ.get("CHAT_IDS", "").split(",")
-
-    # Send flag and country info
-    for chat_id in chat_ids:
-        chat_id = chat_id.strip()
-        if not chat_id:
-            continue
-        print(f"[SEND] Flag to {chat_id} -> {flag_url}")
-        send_image_message(chat_id, flag_url, caption)
-        if head_url:
-            print(f"[SEND] Head of state to {chat_id} -> {head_url}")
-            send_image_message(chat_id, head_url, "👤 Chefe de Estado do País")
+        # We couldn’t get three valid values, so send an error message instead
+        raise NoContent("⚠️ Não foi possível carregar o país do dia.")
+
+    # Photos go out as two albums: the country itself, then its places
+    country_photos = []
+    place_photos = []
+
+    # Flag and country info
+    print(f"[SEND] Flag -> {flag_url}")
+    country_photos.append({"url": flag_url, "caption": caption})
+    if head_url:
+        print(f"[SEND] Head of state -> {head_url}")
+        country_photos.append({"url": head_url, "caption": "👤 Chefe de Estado do País"})
 
     # Extract country name from caption to pass to Google Places
     # (we know it's after “*País do Dia:* ” in the first line)
@@ -127,27 +123,11 @@ def generate():
 
     # ─── Tourist places ───────────────────────────────────────────
     try:
-        tourist_photo_entries = get_random_tourist_photos(country_name, max_photos=2)
+        tourist_photo_entries = get_random_tourist_photos(country_name, max_photos=2, with_trivia=False)
     except Exception as e:
         print(f"[CITIES] Error fetching tourist photos: {e}", flush=True)
         tourist_photo_entries = []
 
-    for entry in tourist_photo_entries:
-        place_name = entry.get("place_name", "Destino")
-        address    = entry.get("address",   "Endereço desconhecido")
-        entry_caption = f"📸 *{place_name}*\n📍 {address}"
-        if entry.get("trivia"):
-            entry_caption += f"\n🧠 {entry['trivia']}"
-        if entry.get("maps_url"):
-            entry_caption += f"\n🔗 [Ver no Google Maps]({entry['maps_url']})"
-
-        for chat_id in chat_ids:
-            chat_id = chat_id.strip()
-            if not chat_id:
-                continue
-            print(f"[SEND] Tourist photo to {chat_id} -> {entry.get('image_url')}")
-            send_image_message(chat_id, entry.get("image_url"), entry_caption)
-
     # ─── City photos ──────────────────────────────────────────────
     curated_photos = []
     found_cities   = 0
@@ -162,7 +142,7 @@ def generate():
         print(f"[CITIES] Trying curated cities: {cities}")
         for city in cities:
             try:
-                photos = get_city_photos_from_name(country_name, city_name=city, max_photos=1)
+                photos = get_city_photos_from_name(country_name, city_name=city, max_photos=1, with_trivia=False)
             except Exception as e:
                 print(f"[CITIES] Error fetching photos for {city}: {e}", flush=True)
                 photos = []
@@ -181,7 +161,7 @@ def generate():
     if len(curated_photos) < 2:
         needed   = 2 - len(curated_photos)
         try:
-            fallback = get_random_city_photos(country_name, max_photos=needed)
+            fallback = get_random_city_photos(country_name, max_photos=needed, with_trivia=False)
         except Exception as e:
             print(f"[CITIES] Error fetching fallback city photos: {e}", flush=True)
             fallback = []
@@ -189,6 +169,21 @@ def generate():
         print(f"[CITIES] Using {len(fallback)} fallback photos")
         curated_photos += fallback
 
+    # Trivia only for the places actually sent, in one batched lookup
+    add_trivia(tourist_photo_entries + curated_photos)
+
+    for entry in tourist_photo_entries:
+        place_name = entry.get("place_name", "Destino")
+        address    = entry.get("address",   "Endereço desconhecido")
+        entry_caption = f"📸 *{place_name}*\n📍 {address}"
+        if entry.get("trivia"):
+            entry_caption += f"\n🧠 {entry['trivia']}"
+        if entry.get("maps_url"):
+            entry_caption += f"\n🔗 [Ver no Google Maps]({entry['maps_url']})"
+
+        print(f"[SEND] Tourist photo -> {entry.get('image_url')}")
+        place_photos.append({"url": entry.get("image_url"), "caption": entry_caption})
+
     for entry in curated_photos:
         place_name = entry.get("place_name", "Destino")
         address    = entry.get("address",   "Endereço desconhecido")
@@ -198,11 +193,7 @@ def generate():
         if entry.get("maps_url"):
             entry_caption += f"\n🔗 [Ver no Google Maps]({entry['maps_url']})"
 
-        for chat_id in chat_ids:
-            chat_id = chat_id.strip()
-            if not chat_id:
-                continue
-            send_image_message(chat_id, entry.get("image_url"), entry_caption)
+        place_photos.append({"url": entry.get("image_url"), "caption": entry_caption})
 
     # ─── Restaurant ────────────────────────────────────────────────
     try:
@@ -224,11 +215,13 @@ def generate():
         if restaurant.get("maps_url"):
             entry_caption += f"\n🔗 [Ver no Google Maps]({restaurant['maps_url']})"
 
-        for chat_id in chat_ids:
-            chat_id = chat_id.strip()
-            if not chat_id:
-                continue
-            print(f"[SEND] Restaurant to {chat_id} -> {restaurant.get('image_url')}")
-            send_image_message(chat_id, restaurant.get("image_url"), entry_caption)
+        print(f"[SEND] Restaurant -> {restaurant.get('image_url')}")
+        place_photos.append({"url": restaurant.get("image_url"), "caption": entry_caption})
+
+    # A photo without a URL would sink the whole album
+    place_photos = [photo for photo in place_photos if photo["url"]]
 
-    return None
+    items = [{"type": "album", "photos": country_photos}]
+    if place_photos:
+        items.append({"type": "album", "photos": place_photos})
+    return items
@@ -1,12 +1,13 @@
-import requests
+from utils import http
 import os
 from telegram_utils import send_telegram_message
+from utils.delivery import NoContent
 
 API_URL = "https://uselessfacts.jsph.pl/random.json?language=en"
 
 def fetch_fact():
     try:
-        res = requests.get(API_URL)
+        res = http.get(API_URL)
         if res.status_code != 200:
             print(f"[FACT] Failed to fetch: {res.status_code}", flush=True)
             return None
@@ -22,4 +23,4 @@ def generate():
     if fact:
         return f"🧠 *Fun fact: *\n_{fact}_"
     else:
-        return "⚠️ Não consegui encontrar um fato interessante hoje."
+        raise NoContent("⚠️ Não consegui encontrar um fato interessante hoje.")
@@ -1,15 +1,17 @@
-import pandas as pd
 import random
 import os
+from utils import datasets
+from utils.sampling import UnseenSampler, make_rng
 
 def load_hanzi_csv():
     path = "data/chinese characters.csv"
-    return pd.read_csv(path)
+    return datasets.load(path)
 
 def get_random_hanzi():
   
-    df = load_hanzi_csv()
-    row = df.sample(1).iloc[0]
+    ds = load_hanzi_csv()
+    # No character repeats until all of them have come up
+    row = ds.row(UnseenSampler("hanzi", [1] * len(ds)).draw(make_rng()))
 
     return {
         "char": row["Character"],
@@ -1,6 +1,4 @@
 import random
-import os
-from telegram_utils import send_image_message
 
 def generate():
     
@@ -11,9 +9,5 @@ def generate():
     # Generate the image URL with cache-busting
     image_url = f"https://picsum.photos/{width}/{height}?random"
     caption = f"🖼️ Imagem aleatória do dia ({width}x{height})"
-    chat_ids = os.environ["CHAT_IDS"].split(",")
-
-    for chat_id in chat_ids:
-        send_image_message(chat_id.strip(), image_url, caption)
-
-    return None
+    # picsum returns a different picture every time, so never reuse its file_id
+    return [{"type": "photo", "url": image_url, "caption": caption, "cache": False}]
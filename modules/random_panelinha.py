@@ -1,14 +1,13 @@
-import requests
+from utils import http
 import re
 from bs4 import BeautifulSoup
-import random
 import itertools
-import os
-import time
-from telegram_utils import send_image_message, send_telegram_message
-from utils.retry import try_with_retries
+import random
+from utils.sampling import AliasTable, make_rng
+from utils.delivery import NoContent
+from utils.retry import retry, check_status, RetryError, RETRY_ON
 
-def get_panelinha():
+def get_panelinha(rng=random):
     
     headers = {
         "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,/;q=0.8,application/signed-exchange;v=b3;q=0.7",
@@ -39,26 +38,35 @@ def get_panelinha():
                      "sobremesas":20,
                      "doces":25}
     
-    categorias_pond = list(itertools.chain(*[[k]*v for k,v in dict_max_page.items()]))
-    random_cat = random.choice(categorias_pond)
+    # Categories weighted by their number of pages
+    categorias = list(dict_max_page)
+    random_cat = categorias[AliasTable(dict_max_page.values()).draw(rng)]
     get_max = dict_max_page.get(random_cat)
-    random_page = random.randint(1,get_max)
+    random_page = rng.randint(1,get_max)
 
     url = f"https://panelinha.com.br/categoria/{random_cat}/pagina/{random_page}"
-    req = requests.get(url, headers=headers)
+    req = check_status(http.get(url, headers=headers))
     soup = BeautifulSoup(req.text, "html.parser")    
     lista_pratos = [x['href'] for x in soup.find_all('a', href=True) if "/receita/" in x['href']]
-    random_prato = random.choice(lista_pratos)
+    random_prato = rng.choice(lista_pratos)
     
     url_prato = "https://panelinha.com.br"+random_prato
-    req_prato = requests.get(url_prato, headers=headers)
+    req_prato = check_status(http.get(url_prato, headers=headers))
     req_prato.encoding = "utf-8"
     return req_prato.text
 
 def generate():
-    req_prato_text = try_with_retries(get_panelinha, attempts=5, delay=3)
-    if req_prato_text is None:
-        return "⚠️ Não foi possível carregar uma receita hoje."
+    # Seeded by SAMPLING_SEED when set; retries keep drawing from it
+    rng = make_rng()
+    try:
+        # Some listing pages have no recipe links, so IndexError is retried too
+        req_prato_text = retry(
+            lambda: get_panelinha(rng), attempts=5, base_delay=2, budget=90,
+            retry_on=RETRY_ON + (IndexError,), breaker="panelinha.com.br"
+        )
+    except RetryError as e:
+        print(f"[PANELINHA] {e}: {e.last}")
+        raise NoContent("⚠️ Não foi possível carregar uma receita hoje.")
 
     soup = BeautifulSoup(req_prato_text, "html.parser")
     nome = soup.find_all("h1", {'class': "tH2"})[0].text.strip()
@@ -87,14 +95,9 @@ def generate():
         print(f"[PANELINHA] Error extracting image: {e}")
         image_url = None
 
-    chat_ids = os.environ["CHAT_IDS"].split(",")
-
-    for chat_id in chat_ids:
-        chat_id = chat_id.strip()
-        if image_url:
-            send_image_message(chat_id, image_url, short_caption)
-            
-    time.sleep(1.5)  # ✅ Ensure image arrives first
-    send_telegram_message(full_text)
+    items = []
+    if image_url:
+        items.append({"type": "photo", "url": image_url, "caption": short_caption})
+    items.append({"type": "text", "text": full_text})
 
-    return None
+    return items
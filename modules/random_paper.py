@@ -1,33 +1,37 @@
-import requests
+from utils import http
+from utils.hedge import first_success
+from utils.retry import check_status, RetryError
+from utils.delivery import NoContent
 from bs4 import BeautifulSoup
 import random
-import os
-from telegram_utils import send_telegram_message
 
-def fetch_core():
-    headers = {'User-Agent': 'Mozilla/5.0'}
+def fetch_work(attempt=0):
+    number = random.randint(1,150000000)
+    url = f"https://core.ac.uk/works/{number}"
+    req = check_status(http.get(url))
+    soup = BeautifulSoup(req.text, "html.parser")
+
+    try:
+        title = soup.find('meta', attrs={'name': 'citation_title'})['content']
+        authors = [meta['content'].replace('\u2009', ' ') for meta in soup.find_all('meta', attrs={'name': 'citation_author'})]
+        abstract = soup.find('meta', attrs={'name': 'DCTERMS.abstract'})['content']
+    except (TypeError, KeyError):
+        print(f"{number} não rodou... Tentando outro")
+        return None
 
-    contagem = 1
-    sucesso = 0
-    while contagem <= 100:
-        number = random.randint(1,150000000)
-        if not sucesso:
-            try:
-                url = f"https://core.ac.uk/works/{number}"
-                req = requests.get(url, headers=headers)
-                soup = BeautifulSoup(req.text, "html.parser")
+    print_authors = "\n".join(authors)
+    return f"🤓Paper de hoje:\n{title}\n\n{print_authors}\n\nAbstract:\n{abstract}\n\nLink: {url}"
 
-                title = soup.find('meta', attrs={'name': 'citation_title'})['content']
-                authors = [meta['content'].replace('\u2009', ' ') for meta in soup.find_all('meta', attrs={'name': 'citation_author'})]
-                abstract = soup.find('meta', attrs={'name': 'DCTERMS.abstract'})['content']
-                print_authors = "\n".join(authors)
-                sucesso = 1
-                return f"🤓Paper de hoje:\n{title}\n\n{print_authors}\n\nAbstract:\n{abstract}\n\nLink: {url}"
-            except:
-                print(f"{number} não rodou... Tentando outro")
-        contagem += 1
-    if not sucesso:
-        print("As 10 tentativas deram pau")
+def fetch_core():
+    # Most random IDs are not valid works, so probe several at once
+    try:
+        paper, tried = first_success(
+            fetch_work, attempts=100, parallelism=4, budget=240,
+            breaker="core.ac.uk", label="CORE"
+        )
+        return paper
+    except RetryError as e:
+        print(f"As tentativas deram pau: {e}")
         return None
 
 def generate():
@@ -35,4 +39,4 @@ def generate():
     if core:
         return core
     else:
-        return "⚠️ Não consegui encontrar o paper de hoje."
+        raise NoContent("⚠️ Não consegui encontrar o paper de hoje.")
@@ -1,8 +1,9 @@
-import requests
+from utils import http
+from utils.delivery import NoContent
 
 def fetch_quote():
     try:
-        res = requests.get("https://zenquotes.io/api/random")
+        res = http.get("https://zenquotes.io/api/random")
         if res.status_code != 200:
             print(f"[QUOTE] Failed to fetch: {res.status_code}", flush=True)
             return None
@@ -16,4 +17,7 @@ def fetch_quote():
         return None
 
 def generate():
-    return fetch_quote() or "⚠️ Não foi possível obter uma citação hoje."
+    quote = fetch_quote()
+    if not quote:
+        raise NoContent("⚠️ Não foi possível obter uma citação hoje.")
+    return quote
@@ -1,11 +1,7 @@
 # random_site_bot.py
 
 import os
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.common.exceptions import TimeoutException, WebDriverException
+from utils.delivery import NoContent
 
 RANDOM_SITE_URL = "http://random.whatsmyip.org/"
 TIMEOUT = 15  # seconds to wait for the JS-injected link
@@ -16,6 +12,13 @@ def fetch_random_site(timeout: int = TIMEOUT) -> str | None:
     waits for <a id="random_link"> to get a non-empty href, and returns it.
     Returns None on failure.
     """
+    # Selenium is heavy, so it is only imported once a browser is needed
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.chrome.service import Service as ChromeService
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+
     try:
         # 1) Tell Selenium exactly where chromedriver is on Ubuntu:
         driver_path = "/usr/lib/chromium-browser/chromedriver"
@@ -62,10 +65,10 @@ def generate() -> str:
       🌐 *Website aleatório do dia: *
       https://some-random-site.example
 
-    Falls back to an error message if Selenium fails.
+    Raises NoContent with an error message if Selenium fails.
     """
     link = fetch_random_site(timeout=TIMEOUT)
     if link:
         return f"🌐 *Website aleatório do dia: *\n{link}"
     else:
-        return "⚠️ Não consegui obter o site aleatório hoje."
+        raise NoContent("⚠️ Não consegui obter o site aleatório hoje.")
@@ -1,6 +1,7 @@
-import requests
+from utils import http
 from random_word import RandomWords
-from utils.retry import try_with_retries
+from utils.hedge import first_success
+from utils.retry import RetryError
 
 def fetch_definition():
     r = RandomWords()
@@ -10,7 +11,7 @@ def fetch_definition():
 
     url = f"https://api.dictionaryapi.dev/api/v2/entries/en/{word}"
     try:
-        res = requests.get(url)
+        res = http.get(url)
         if res.status_code != 200:
             return None
 
@@ -24,4 +25,12 @@ def fetch_definition():
         return None
 
 def generate():
-    return try_with_retries(fetch_definition, attempts=10, delay=10)
+    # Many random words have no dictionary entry, so try several at once
+    try:
+        definition, tried = first_success(
+            lambda i: fetch_definition(), attempts=10, parallelism=4, budget=60, label="WORD"
+        )
+        return definition
+    except RetryError as e:
+        print(f"[WORD] {e}")
+        return None
@@ -0,0 +1,167 @@
+from utils import http
+import random
+import threading
+import time
+
+from utils.retry import check_status, retry
+from utils.state import load_json, save_json
+
+# Requests go through the shared client, which holds musicbrainz.org to
+# 1 req/s (utils.http.HOST_RATES) and serves cached answers without
+# spending a request.
+API_URL = "https://musicbrainz.org/ws/2"
+
+DAY = 24 * 3600
+AREA_TTL = 365 * DAY           # country -> area MBID never really changes
+ARTIST_COUNT_TTL = 7 * DAY     # first browse page, only used for its total
+RELEASE_GROUPS_TTL = 7 * DAY   # artist -> release-group list
+
+COVER_ART_URL = "https://coverartarchive.org/release"
+COVER_SIZE = 500  # thumbnail width; Telegram fetches the image itself
+# Releases known to have no front cover, skipped until the entry expires
+NO_COVER_FILE = "caa_no_cover.json"
+NO_COVER_TTL = 90 * DAY
+_no_cover = None
+_no_cover_lock = threading.Lock()
+
+def mb_get(path, params, cache_ttl=None):
+    """GETs a JSON resource from the MusicBrainz API, retrying 503s and network errors."""
+    params = dict(params, fmt="json")
+
+    def call():
+        res = check_status(http.get(f"{API_URL}/{path}", params=params, cache_ttl=cache_ttl))
+        res.raise_for_status()
+        return res.json()
+
+    return retry(call, attempts=3, base_delay=2, breaker="musicbrainz.org")
+
+def _artist(artist):
+    return {
+        "name": artist.get("name"),
+        "id": artist.get("id"),
+        "disambiguation": artist.get("disambiguation", ""),
+        "type": artist.get("type", "")
+    }
+
+def search_artists(query, limit=100, offset=0):
+    """Lucene artist search. Returns (artists, total count)."""
+    data = mb_get("artist", {"query": query, "limit": limit, "offset": offset})
+    return [_artist(a) for a in data.get("artists", [])], data.get("count", 0)
+
+def area_for_country(country_code):
+    """MBID of the area with this ISO 3166-1 alpha-2 code, or None."""
+    data = mb_get("area", {"query": f"iso1:{country_code}", "limit": 1}, cache_ttl=AREA_TTL)
+    areas = data.get("areas", [])
+    return areas[0]["id"] if areas else None
+
+def browse_artists(area_id, limit=100, offset=0):
+    """
+    Artists whose area is `area_id`, in the stable order MusicBrainz
+    browses them (unlike search offsets, a given offset is always the same
+    artist). Returns (artists, total count).
+    """
+    ttl = ARTIST_COUNT_TTL if offset == 0 else None
+    data = mb_get("artist", {"area": area_id, "limit": limit, "offset": offset}, cache_ttl=ttl)
+    return [_artist(a) for a in data.get("artists", [])], data.get("artist-count", 0)
+
+def random_artist_in_country(country_code, rng=random):
+    """
+    A uniformly random artist from a country, via browse mode: one cached
+    lookup for the area and its artist count, then one page of size 1.
+    Returns None if MusicBrainz has no such area or no artists in it.
+    """
+    area_id = area_for_country(country_code)
+    if not area_id:
+        return None
+    artists, count = browse_artists(area_id, limit=1)
+    if not count:
+        return None
+    offset = rng.randrange(count)
+    if offset:
+        artists, count = browse_artists(area_id, limit=1, offset=offset)
+    return artists[0] if artists else None
+
+def artist_release_summary(artist_id):
+    """
+    (has releases, has a release with a front cover) for an artist, from
+    one browse call over its first 100 releases.
+    """
+    data = mb_get("release", {"artist": artist_id, "limit": 100})
+    releases = data.get("releases", [])
+    has_cover = any(r.get("cover-art-archive", {}).get("front") for r in releases)
+    return bool(data.get("release-count", len(releases))), has_cover
+
+def release_groups(artist_id):
+    """The artist's release groups (up to 100), cached on disk."""
+    data = mb_get("release-group", {"artist": artist_id, "limit": 100}, cache_ttl=RELEASE_GROUPS_TTL)
+    return data.get("release-groups", [])
+
+def releases_with_recordings(release_group_id, limit=10):
+    """Releases of a release group, each with its media and tracks (inc=recordings), in one call."""
+    data = mb_get("release", {"release-group": release_group_id, "inc": "recordings", "limit": limit})
+    return data.get("releases", [])
+
+def random_track(artist_id, rng=random):
+    """
+    Picks a random release group, release and track of an artist in two
+    calls (the release-group list is usually cached). Returns a dict with
+    track_title, release_title and release_id, or None if the artist has
+    nothing with tracks.
+    """
+    groups = release_groups(artist_id)
+    if not groups:
+        return None
+    releases = releases_with_recordings(rng.choice(groups)["id"])
+    releases = [r for r in releases if any(m.get("tracks") for m in r.get("media", []))]
+    if not releases:
+        return None
+
+    # Prefer a release the Cover Art Archive has a front cover for
+    covered = [r for r in releases if r.get("cover-art-archive", {}).get("front")]
+    release = rng.choice(covered or releases)
+    tracks = [t for m in release["media"] for t in m.get("tracks", [])]
+    track = rng.choice(tracks)
+    return {
+        "artist_id": artist_id,
+        "track_title": track["title"],
+        "release_title": release["title"],
+        "release_id": release["id"],
+        # MusicBrainz already says whether the archive has a front cover
+        "cover_front": release.get("cover-art-archive", {}).get("front"),
+    }
+
+def _load_no_cover():
+    global _no_cover
+    if _no_cover is None:
+        now = time.time()
+        _no_cover = {r: t for r, t in load_json(NO_COVER_FILE, {}).items() if now - t < NO_COVER_TTL}
+    return _no_cover
+
+def _remember_no_cover(release_id):
+    with _no_cover_lock:
+        _load_no_cover()[release_id] = time.time()
+        save_json(NO_COVER_FILE, _no_cover)
+
+def cover_image(release_id, has_front=None):
+    """
+    URL of the release's front cover thumbnail, or None. The archive is
+    asked for the thumbnail without following its redirect, so no image
+    bytes are downloaded. Releases without a cover are remembered across
+    runs; pass `has_front` (from the release's cover-art-archive info) to
+    skip the request when MusicBrainz already knows.
+    """
+    with _no_cover_lock:
+        if release_id in _load_no_cover():
+            return None
+    if has_front is False:
+        _remember_no_cover(release_id)
+        return None
+
+    res = http.get(f"{COVER_ART_URL}/{release_id}/front-{COVER_SIZE}", allow_redirects=False, cache=False)
+    if res.is_redirect:
+        return res.headers["Location"]
+    if res.status_code == 200:
+        return res.url
+    if res.status_code == 404:
+        _remember_no_cover(release_id)
+    return None
@@ -0,0 +1,55 @@
+import os
+import datetime
+
+# Declarative list of bulletin modules, in the order they are scheduled.
+#
+#   name      file in modules/ (without .py)
+#   enabled   set to False to switch a module off without deleting it
+#   days      weekdays the module runs on ("mon".."sun"); default every day
+#   every     run only every N days (counted from the date ordinal)
+#   needs     capabilities the module requires, see CAPABILITIES below
+#   deadline  wall-clock seconds before generate() is abandoned
+#   digest    short text output that digest mode may merge with the others
+MODULES = [
+    {"name": "random_number", "digest": True},
+    {"name": "random_quote", "digest": True},
+    {"name": "random_funfact", "digest": True},
+    {"name": "on_this_day", "digest": True},
+    {"name": "random_word", "deadline": 150, "digest": True},
+    {"name": "palavra_aleatoria", "digest": True},
+    {"name": "random_hanzi", "digest": True},
+    {"name": "random_paper"},
+    {"name": "random_website", "needs": ["chromium"], "deadline": 90, "digest": True},
+    {"name": "random_image"},
+    {"name": "random_country", "needs": ["google_api"], "deadline": 600},
+    {"name": "random_bird"},
+    {"name": "random_song", "deadline": 600},
+    {"name": "random_panelinha"},
+]
+
+CHROMIUM_PATHS = ["/usr/bin/chromium-browser", "/usr/bin/chromium"]
+
+CAPABILITIES = {
+    "google_api": lambda: bool(os.environ.get("GOOGLE_API_KEY")),
+    "chromium": lambda: any(os.path.exists(p) for p in CHROMIUM_PATHS),
+}
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+def is_due(entry, today=None):
+    today = today or datetime.date.today()
+    if not entry.get("enabled", True):
+        return False
+    days = entry.get("days")
+    if days and WEEKDAYS[today.weekday()] not in days:
+        return False
+    return today.toordinal() % entry.get("every", 1) == 0
+
+def missing_capabilities(entry):
+    return [cap for cap in entry.get("needs", []) if not CAPABILITIES[cap]()]
+
+def get_entry(name):
+    for entry in MODULES:
+        if entry["name"] == name:
+            return entry
+    raise KeyError(f"Unknown module: {name}")
@@ -0,0 +1,69 @@
+from utils import http
+import os
+
+from utils.snapshot import Snapshot, now_iso
+
+# Every country restcountries knows, keyed by alpha-2 code
+# (built by misc/build_restcountries.py, see utils.snapshot)
+RESTCOUNTRIES_PATH = "data/restcountries.json"
+# Refresh the snapshot at runtime once it's older than this many days (unset: never)
+RESTCOUNTRIES_MAX_AGE = os.environ.get("RESTCOUNTRIES_MAX_AGE_DAYS")
+
+# Only what random_country shows (the API allows at most 10 fields)
+FIELDS = ["cca2", "name", "capital", "population", "area", "region", "languages", "currencies", "flags"]
+
+def build_restcountries():
+    """Pulls every country from /v3.1/all and returns the snapshot dict (not yet saved)."""
+    res = http.get(
+        "https://restcountries.com/v3.1/all",
+        params={"fields": ",".join(FIELDS)},
+        cache=False, timeout=(10, 60)
+    )
+    res.raise_for_status()
+
+    countries = {}
+    for country in res.json():
+        cc = country.pop("cca2", None)
+        if not cc:
+            continue
+        # Only the PNG flag is used
+        country["flags"] = {"png": country.get("flags", {}).get("png")}
+        countries[cc.upper()] = country
+    return {"built": now_iso(), "countries": countries}
+
+restcountries = Snapshot(
+    RESTCOUNTRIES_PATH, build_restcountries,
+    max_age_days=float(RESTCOUNTRIES_MAX_AGE) if RESTCOUNTRIES_MAX_AGE else None
+)
+
+def known_codes():
+    """Alpha-2 codes in the snapshot (empty if there is no snapshot)."""
+    data = restcountries.get()
+    return set(data["countries"]) if data else set()
+
+def code_for_name(name):
+    """Alpha-2 code of a country by its common or official English name, or None."""
+    data = restcountries.get()
+    if not data:
+        return None
+    name = name.strip().lower()
+    for cc, country in data["countries"].items():
+        names = country.get("name", {})
+        if name in (names.get("common", "").lower(), names.get("official", "").lower()):
+            return cc
+    return None
+
+def get_country(cc):
+    """
+    Returns the restcountries record for an alpha-2 code, from the snapshot
+    if there is one, otherwise live from the API. None if unknown.
+    """
+    data = restcountries.get()
+    if data:
+        return data["countries"].get(cc.upper())
+
+    res = http.get(f"https://restcountries.com/v3.1/alpha/{cc.lower()}", timeout=10)
+    if res.status_code != 200:
+        print(f"[COUNTRY] API failed: {res.status_code}", flush=True)
+        return None
+    return res.json()[0]
@@ -1,80 +1,554 @@
-import requests
+from utils import http
+from utils.ratelimit import TokenBucket
+from utils.state import load_json, save_json
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
 import os
-import time
+import threading
 
-def send_telegram_message(text):
-    token = os.environ["TELEGRAM_TOKEN"]
-    chat_ids = os.environ["CHAT_IDS"].split(",")
-
-    for chat_id in chat_ids:
-        response = requests.get(
-            f"https://api.telegram.org/bot{token}/sendMessage",
-            params={
-                "chat_id": chat_id.strip(),
-                "text": text,
-                "parse_mode": "Markdown"  # ✅ THIS is what enables **bold**, __italic__, etc.
-            }
-        )
-        print(f"Sent to {chat_id.strip()}: {response.status_code}, {response.text}")
-
-def send_image_message(chat_id, image_url, caption=None):
+# Telegram downloads photos sent by URL before answering, so allow a longer read
+MEDIA_TIMEOUT = (10, 60)
+MAX_RETRIES = 5
+MAX_CAPTION = 1024
+MAX_ALBUM = 10
+MAX_MESSAGE = 4096
+
+# Telegram's documented limits: ~30 messages/s overall, ~1 message/s in a
+# single chat and 20 messages/min in a group. Buckets are created per chat.
+GLOBAL_BUCKET = TokenBucket(rate=30, capacity=30)
+CHAT_RATE = 1
+GROUP_RATE = 20 / 60
+_chat_buckets = {}
+_buckets_lock = threading.Lock()
+
+# file_ids of media already uploaded to Telegram, keyed by a hash of the
+# source URL or of the file's bytes. Telegram lets a bot resend a file by
+# file_id to any chat without uploading it again.
+FILE_IDS_FILE = "telegram_file_ids.json"
+MAX_FILE_IDS = 5000
+_file_ids = None
+_file_ids_lock = threading.Lock()
+
+def _buckets_for(chat_id):
+    with _buckets_lock:
+        if chat_id not in _chat_buckets:
+            buckets = [TokenBucket(rate=CHAT_RATE, capacity=1)]
+            if str(chat_id).startswith("-"):  # groups and channels have negative ids
+                buckets.append(TokenBucket(rate=GROUP_RATE, capacity=20))
+            _chat_buckets[chat_id] = buckets
+        return _chat_buckets[chat_id]
+
+def _call(method, chat_id, data, files=None, timeout=None):
+    """
+    Calls a Telegram Bot API method for one chat, waiting for the rate
+    limits first and retrying when Telegram answers 429 with `retry_after`.
+    Returns the last response.
+    """
     token = os.environ["TELEGRAM_TOKEN"]
-    url = f"https://api.telegram.org/bot{token}/sendPhoto"
+    url = f"https://api.telegram.org/bot{token}/{method}"
+    buckets = _buckets_for(chat_id)
+
+    for attempt in range(MAX_RETRIES):
+        for bucket in buckets:
+            bucket.acquire()
+        GLOBAL_BUCKET.acquire()
+
+        for f in (files or {}).values():
+            if hasattr(f, "seek"):
+                f.seek(0)
+        response = http.post(url, data={"chat_id": chat_id, **data}, files=files, timeout=timeout)
+        if response.status_code != 429:
+            return response
+
+        try:
+            retry_after = response.json()["parameters"]["retry_after"]
+        except Exception:
+            retry_after = 2 ** attempt
+        print(f"[Telegram] 429 for {chat_id}, retrying in {retry_after}s")
+        buckets[0].pause(retry_after)
+
+    return response
+
+def _load_file_ids():
+    global _file_ids
+    with _file_ids_lock:
+        if _file_ids is None:
+            _file_ids = load_json(FILE_IDS_FILE, {})
+        return _file_ids
+
+def _save_file_ids():
+    with _file_ids_lock:
+        if _file_ids is None:
+            return
+        for key in list(_file_ids)[:-MAX_FILE_IDS]:
+            del _file_ids[key]
+        try:
+            save_json(FILE_IDS_FILE, _file_ids)
+        except OSError as e:
+            print(f"[Telegram] Could not save file_id cache: {e}")
+
+def _caption(text):
+    if text and len(text) > MAX_CAPTION:
+        return text[:MAX_CAPTION - 1] + "…"
+    return text
+
+def _tg_len(text):
+    # Telegram counts message length in UTF-16 code units (emoji count as 2)
+    return len(text.encode("utf-16-le")) // 2
+
+def _is_balanced(text):
+    # True if no legacy-Markdown entity or code block is left open
+    fences = text.count("```")
+    if fences % 2:
+        return False
+    outside = "".join(text.split("```")[::2])
+    outside = outside.replace("\\*", "").replace("\\_", "").replace("\\`", "")
+    return all(outside.count(c) % 2 == 0 for c in "*_`")
+
+def _cut_utf16(text, units):
+    # Splits text after at most `units` UTF-16 code units (always at least one character)
+    n = 0
+    for i, ch in enumerate(text):
+        n += 2 if ord(ch) > 0xFFFF else 1
+        if n > units:
+            i = max(i, 1)
+            return text[:i], text[i:]
+    return text, ""
+
+def _split_long(text, limit):
+    """
+    Splits one text that is over `limit` at line breaks, preferring breaks
+    where no Markdown entity is open. A code block that has to be cut is
+    closed at the end of one part and reopened at the start of the next.
+    Lines too long for one message are cut hard.
+    """
+    # Room for the "\n```" that closes a cut code block
+    room = limit - 4
+    parts = []
+    lines = text.split("\n")
+    while lines:
+        chunk, best = [], None
+        for i, line in enumerate(lines):
+            candidate = "\n".join(chunk + [line])
+            if _tg_len(candidate) > room and chunk:
+                break
+            chunk.append(line)
+            if _is_balanced(candidate):
+                best = i + 1
+        cut = best or len(chunk)
+        part = "\n".join(lines[:cut])
+        lines = lines[cut:]
+        if _tg_len(part) > room:
+            # A single huge line, cut it hard
+            part, rest = _cut_utf16(part, room)
+            lines.insert(0, rest)
+        elif lines and not part.replace("```", "").strip():
+            # Only fence markers so far (e.g. a reopened code block before a
+            # huge line): fill up with the start of the next line, so every
+            # pass uses up some text
+            head, rest = _cut_utf16(lines[0], room - _tg_len(part) - 1)
+            part += "\n" + head
+            lines[0] = rest
+            if not rest:
+                lines.pop(0)
+        if part.count("```") % 2:
+            part += "\n```"
+            if lines:
+                lines.insert(0, "```")
+        parts.append(part)
+    return parts
+
+def pack_messages(texts, limit=MAX_MESSAGE, separator="\n\n"):
+    """
+    Packs short texts into as few messages as possible, keeping their order.
+
+    Texts are never split unless one alone is longer than `limit`, so
+    Markdown entities stay inside the message they started in. A text
+    whose Markdown isn't balanced is never packed with others, since
+    Telegram would reject the whole message over it.
+
+    Returns a list of items: a plain string for a message made of one
+    text, or {"type": "text", "text": ..., "parts": [...]} for one made of
+    several, so the parts can be sent one by one if the whole is rejected.
+    """
+    messages = []
+    current = []
+
+    def flush():
+        if len(current) == 1:
+            messages.append(current[0])
+        elif current:
+            messages.append({"type": "text", "text": separator.join(current), "parts": list(current)})
+        current.clear()
+
+    for text in texts:
+        pieces = _split_long(text, limit) if _tg_len(text) > limit else [text]
+        if not _is_balanced(text):
+            flush()
+            messages.extend(pieces)
+            continue
+        for piece in pieces:
+            if current and _tg_len(separator.join(current + [piece])) > limit:
+                flush()
+            current.append(piece)
+    flush()
+    return messages
+
+def _media_key(item):
+    if item.get("type") == "photo":
+        return "url:" + hashlib.sha256(item["url"].encode("utf-8")).hexdigest()
+    if item.get("type") == "audio":
+        try:
+            with open(item["path"], "rb") as f:
+                return "sha256:" + hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None  # send_audio reports the missing file per chat
+    return None
+
+def _file_id_from(response, field):
+    try:
+        result = response.json()["result"]
+    except Exception:
+        return None
+    return _file_id_in(result, field)
+
+def _file_id_in(message, field):
+    media = message.get(field) or message.get("document")
+    if isinstance(media, list):  # photos come in several sizes, largest last
+        media = media[-1] if media else None
+    return media.get("file_id") if media else None
+
+class SharedUpload:
+    """
+    One media item being sent to several chats: the first chat to reach it
+    uploads it, the others wait and reuse the file_id Telegram returns.
+
+    Parameters:
+        key (str): Cache key from _media_key().
+        persist (bool): Keep the file_id for later runs too. Use False for
+            sources whose content changes between runs (e.g. random images).
+    """
+
+    def __init__(self, key, persist=True):
+        self.key = key
+        self.persist = persist
+        self.file_id = _load_file_ids().get(key) if persist else None
+        self.cached = self.file_id is not None
+        self.done = threading.Event()
+        self.claimed = False
+        self.lock = threading.Lock()
+        if self.file_id:
+            self.done.set()
+
+    def claim(self):
+        with self.lock:
+            if self.claimed or self.done.is_set():
+                return False
+            self.claimed = True
+            return True
+
+    def resolve(self, file_id):
+        self.file_id = file_id
+        if file_id and self.persist:
+            with _file_ids_lock:
+                _file_ids[self.key] = file_id
+        self.done.set()
+
+    def forget(self):
+        # A cached file_id Telegram no longer accepts (e.g. the bot token changed)
+        with _file_ids_lock:
+            _file_ids.pop(self.key, None)
+
+def _send_media(chat_id, method, field, send_source, data, upload):
+    """
+    Sends by file_id when `upload` already has one, otherwise uploads from
+    the source with `send_source()` and records the file_id for the others.
+    """
+    if upload is None:
+        return send_source()
+
+    if upload.claim():
+        response = None
+        try:
+            response = send_source()
+            return response
+        finally:
+            ok = response is not None and response.ok
+            upload.resolve(_file_id_from(response, field) if ok else None)
+
+    upload.done.wait()
+    if upload.file_id:
+        response = _call(method, chat_id, {field: upload.file_id, **data}, timeout=MEDIA_TIMEOUT)
+        if response.ok:
+            return response
+        print(f"[Telegram] file_id rejected for {chat_id}, uploading again")
+        if upload.cached:
+            upload.forget()
+    return send_source()
+
+def get_chat_ids():
+    return [c.strip() for c in os.environ["CHAT_IDS"].split(",") if c.strip()]
+
+def _fan_out(send, chat_ids=None):
+    """
+    Runs `send(chat_id)` for every chat in parallel; each chat's own sends
+    stay in order because they happen inside one call. Re-raises the first
+    error once every chat is done.
+    """
+    chat_ids = get_chat_ids() if chat_ids is None else chat_ids
+    if not chat_ids:
+        return
+    with ThreadPoolExecutor(max_workers=len(chat_ids)) as pool:
+        futures = [pool.submit(send, chat_id) for chat_id in chat_ids]
+    errors = [f.exception() for f in futures if f.exception()]
+    if errors:
+        raise errors[0]
+
+def send_text(chat_id, text):
+    response = _call("sendMessage", chat_id, {
+        "text": text,
+        "parse_mode": "Markdown"  # ✅ THIS is what enables **bold**, __italic__, etc.
+    })
+    print(f"Sent to {chat_id}: {response.status_code}, {response.text}")
+    return response
+
+def send_telegram_message(text):
+    _fan_out(lambda chat_id: send_text(chat_id, text))
+
+def send_image_message(chat_id, image_url, caption=None, upload=None):
     payload = {
-        "chat_id": chat_id,
-        "photo": image_url,
-        "caption": caption,
+        "caption": _caption(caption),
         "parse_mode": "Markdown"
     }
-    response = requests.post(url, data=payload)
+
+    def send_source():
+        return _call("sendPhoto", chat_id, {"photo": image_url, **payload}, timeout=MEDIA_TIMEOUT)
+
+    response = _send_media(chat_id, "sendPhoto", "photo", send_source, payload, upload)
     print(f"[Image] Sent to {chat_id}: {response.status_code}")
+    return response
 
-def send_image_message_v2(chat_id, image_url, caption=None):
-    token = os.environ["TELEGRAM_TOKEN"]
-    telegram_url = f"https://api.telegram.org/bot{token}/sendPhoto"
+def send_image_message_v2(chat_id, image_url, caption=None, upload=None):
+    """Like send_image_message, but downloads the image and uploads the bytes."""
+    data = {"caption": caption, "parse_mode": "Markdown"}
 
-    try:
-        image_res = requests.get(image_url)
+    def send_source():
+        image_res = http.get(image_url)
         if image_res.status_code != 200:
             print(f"[Image] Failed to fetch image: {image_res.status_code}")
-            return
-
+            return None
         files = {"photo": ("image.jpg", image_res.content)}
-        data = {"chat_id": chat_id, "caption": caption, "parse_mode": "Markdown"}
-        response = requests.post(telegram_url, data=data, files=files)
+        return _call("sendPhoto", chat_id, data, files=files, timeout=MEDIA_TIMEOUT)
+
+    try:
+        response = _send_media(chat_id, "sendPhoto", "photo", send_source, data, upload)
+        if response is None:
+            return
         print(f"[Image] Sent to {chat_id}: {response.status_code}")
         print(response.text)
+        return response
     except Exception as e:
         print(f"[Image] Error: {e}")
 
-def send_telegram_audio(link, folder):
-    token = os.environ["TELEGRAM_TOKEN"]
-    chat_ids = os.environ["CHAT_IDS"].split(",")
+def send_media_group(chat_id, photos, uploads=None):
+    """
+    Sends photos as albums (sendMediaGroup), up to 10 per album, each with
+    its own caption. `photos` are dicts with "url" and optional "caption";
+    `uploads` are their SharedUploads, as in broadcast(). A single
+    leftover photo is sent with sendPhoto, since albums need two or more.
+    """
+    uploads = uploads or [None] * len(photos)
+    responses = []
+    for start in range(0, len(photos), MAX_ALBUM):
+        chunk = photos[start:start + MAX_ALBUM]
+        chunk_uploads = uploads[start:start + MAX_ALBUM]
+        if len(chunk) == 1:
+            responses.append(send_image_message(chat_id, chunk[0]["url"], chunk[0].get("caption"), chunk_uploads[0]))
+        else:
+            responses.append(_send_album(chat_id, chunk, chunk_uploads))
+    return responses[-1] if responses else None
+
+def _send_album(chat_id, photos, uploads):
+    urls = [photo["url"] for photo in photos]
+    tracked = [u for u in uploads if u is not None]
+
+    def send(sources):
+        media = [
+            {"type": "photo", "media": source, "caption": _caption(photo.get("caption")), "parse_mode": "Markdown"}
+            for photo, source in zip(photos, sources)
+        ]
+        response = _call("sendMediaGroup", chat_id, {"media": json.dumps(media)}, timeout=MEDIA_TIMEOUT)
+        print(f"[Album] Sent {len(media)} photos to {chat_id}: {response.status_code}")
+        return response
+
+    def send_each():
+        # One bad photo makes Telegram reject the whole album, so send them
+        # one at a time and let only the bad ones be skipped
+        print(f"[Album] Rejected for {chat_id}, sending its photos one by one")
+        responses = [send_image_message(chat_id, url, photo.get("caption")) for photo, url in zip(photos, urls)]
+        failed = [r for r in responses if not r.ok and not _rejected(r)]
+        file_ids = [_file_id_from(r, "photo") if r.ok else None for r in responses]
+        return (failed[0] if failed else responses[-1]), file_ids
+
+    def deliver(sources):
+        """
+        Sends the album from `sources`, falling back to the URLs if file_ids
+        are rejected, then to single photos if the album is. Returns the
+        response and the file_id of each photo (None where unknown).
+        """
+        response = send(sources)
+        if not response.ok and sources != urls:
+            print(f"[Telegram] album file_ids rejected for {chat_id}, uploading again")
+            for u in tracked:
+                if u.cached:
+                    u.forget()
+            response = send(urls)
+        if _rejected(response):
+            return send_each()
+        try:
+            messages = response.json()["result"] if response.ok else []
+        except Exception:
+            messages = []
+        return response, [_file_id_in(m, "photo") for m in messages]
+
+    pending = [u for u in tracked if not u.done.is_set()]
 
-    for chat_id in chat_ids:
+    # Whoever claims the first pending photo uploads the whole album; it
+    # resolves the photos last to first, so that claim stays the gate.
+    if pending and pending[0].claim():
+        file_ids = []
         try:
-            with open(f'./{folder}/{link}', 'rb') as audio:
-                payload = {
-                    'chat_id': chat_id.strip(),
-                    'parse_mode': 'HTML'
-                }
-                files = {
-                    'audio': audio,
-                }
-                response = requests.post(
-                    f"https://api.telegram.org/bot{token}/sendAudio",
-                    data=payload,
-                    files=files
-                )
-
-                if response.ok:
-                    print(f"[Audio] ✅ Sent to {chat_id.strip()}")
-                else:
-                    print(f"[Audio] ❌ Failed for {chat_id.strip()}: {response.text}")
-
-            # Add delay to avoid rate-limiting
-            time.sleep(1.5)
-
-        except Exception as e:
-            print(f"[Audio] ❗ Error sending to {chat_id.strip()}: {e}")
+            response, file_ids = deliver([u.file_id if u and u.file_id else url for u, url in zip(uploads, urls)])
+            return response
+        finally:
+            for i in reversed(range(len(photos))):
+                if uploads[i] is not None and not uploads[i].done.is_set():
+                    uploads[i].resolve(file_ids[i] if i < len(file_ids) else None)
 
+    for u in tracked:
+        u.done.wait()
+    return deliver([u.file_id if u and u.file_id else url for u, url in zip(uploads, urls)])[0]
+
+def send_audio(chat_id, path, upload=None):
+    payload = {'parse_mode': 'HTML'}
+
+    def send_source():
+        with open(path, 'rb') as audio:
+            return _call("sendAudio", chat_id, payload, files={'audio': audio}, timeout=MEDIA_TIMEOUT)
+
+    try:
+        response = _send_media(chat_id, "sendAudio", "audio", send_source, payload, upload)
+
+        if response.ok:
+            print(f"[Audio] ✅ Sent to {chat_id}")
+        else:
+            print(f"[Audio] ❌ Failed for {chat_id}: {response.text}")
+        return response
+
+    except Exception as e:
+        print(f"[Audio] ❗ Error sending to {chat_id}: {e}")
+
+def send_telegram_audio(link, folder):
+    path = f'./{folder}/{link}'
+    upload = SharedUpload(_media_key({"type": "audio", "path": path}))
+    _fan_out(lambda chat_id: send_audio(chat_id, path, upload))
+    _save_file_ids()
+
+def _send_item(chat_id, item, upload=None):
+    if isinstance(item, str):
+        item = {"type": "text", "text": item}
+
+    kind = item.get("type")
+    if kind == "text":
+        response = send_text(chat_id, item["text"])
+        if item.get("parts") and _rejected(response):
+            # One bad part makes Telegram refuse the packed message, so
+            # send the parts alone and let only the bad ones be skipped
+            print(f"[Telegram] Packed message rejected for {chat_id}, sending its parts one by one")
+            responses = [send_text(chat_id, part) for part in item["parts"]]
+            failed = [r for r in responses if not r.ok and not _rejected(r)]
+            return failed[0] if failed else responses[-1]
+        return response
+    elif kind == "photo":
+        return send_image_message(chat_id, item["url"], item.get("caption"), upload)
+    elif kind == "audio":
+        return send_audio(chat_id, item["path"], upload)
+    elif kind == "album":
+        return send_media_group(chat_id, item["photos"], upload)
+    raise ValueError(f"Unknown message type: {kind}")
+
+class DeliveryError(Exception):
+    pass
+
+def _rejected(response):
+    """True for a 4xx other than 429: Telegram refused the request itself."""
+    return response is not None and 400 <= response.status_code < 500 and response.status_code != 429
+
+def _delivered(response):
+    """
+    True if the item can be counted as done for this chat: it was sent, or
+    Telegram rejected it for good (a 4xx other than 429), in which case
+    trying again later wouldn't help.
+    """
+    if response is None:
+        return False
+    if response.ok:
+        return True
+    if _rejected(response):
+        print(f"[Telegram] Skipping item rejected with {response.status_code}: {response.text}")
+        return True
+    return False
+
+def as_items(output):
+    """Normalizes a module output (string, item or list of items) to a list of items."""
+    if not output:
+        return []
+    return [output] if isinstance(output, (str, dict)) else list(output)
+
+def broadcast(output, start=None, on_sent=None):
+    """
+    Sends a module's output to every chat.
+
+    `output` is either a plain string (sent as a text message) or a list of
+    items, each a string or a dict:
+        {"type": "text",  "text": ..., "parts": [...]}  (parts optional, see pack_messages)
+        {"type": "photo", "url": ..., "caption": ..., "cache": True}
+        {"type": "audio", "path": ...}
+        {"type": "album", "photos": [{"url": ..., "caption": ...}, ...]}
+    Chats are served in parallel; within a chat, items arrive in list order.
+    Each photo/audio is uploaded once and resent to the other chats by
+    file_id. Set "cache": False on items whose source URL doesn't always
+    return the same content, so the file_id isn't reused on later runs.
+
+    To resume an interrupted delivery, pass `start` as {chat_id: number of
+    items that chat already got}; only those chats are served, from there
+    on. `on_sent(chat_id, count)` is called after each item is done. A chat
+    stops at the first item that fails for a transient reason, so its
+    order is kept when it's resumed, and DeliveryError is raised at the end.
+    """
+    items = as_items(output)
+    start = start if start is not None else {chat_id: 0 for chat_id in get_chat_ids()}
+    uploads = []
+    for item in items:
+        if isinstance(item, dict) and item.get("type") == "album":
+            uploads.append([
+                SharedUpload(_media_key({"type": "photo", **photo}), photo.get("cache", True))
+                for photo in item["photos"]
+            ])
+            continue
+        key = _media_key(item) if isinstance(item, dict) else None
+        uploads.append(SharedUpload(key, item.get("cache", True)) if key else None)
+
+    def deliver(chat_id):
+        for index in range(start[chat_id], len(items)):
+            response = _send_item(chat_id, items[index], uploads[index])
+            if not _delivered(response):
+                raise DeliveryError(f"chat {chat_id} stopped at item {index + 1} of {len(items)}")
+            if on_sent:
+                on_sent(chat_id, index + 1)
+
+    try:
+        _fan_out(deliver, [chat_id for chat_id, sent in start.items() if sent < len(items)])
+    finally:
+        _save_file_ids()
@@ -0,0 +1,105 @@
+"""
+Per-country shards of MusicBrainz artists, for sampling a known-good artist
+without any search.
+
+One shard file per country holds, for each artist, its MBID (16 bytes),
+a flags byte and its name. Artists are sorted so that the ones with a
+front cover come first, then the ones with releases but no cover, then
+the rest; the header stores how many fall in each group, so drawing a
+random artist from the best group is one random index. The file is
+memory-mapped and names are packed like utils.wordindex (uint32 offsets
+plus one UTF-8 blob).
+
+Shards are written by misc/build_artist_index.py.
+"""
+import mmap
+import os
+import random
+import struct
+import sys
+import threading
+import uuid
+from array import array
+
+INDEX_DIR = "data/artist_index"
+
+MAGIC = b"BAIX1\0\0\0"
+HEADER = struct.Struct("<8sIII")  # magic, count, with cover, with releases (cover included)
+
+HAS_RELEASES = 1
+HAS_COVER = 2
+
+def _rank(artist):
+    flags = artist["flags"]
+    return 0 if flags & HAS_COVER else 1 if flags & HAS_RELEASES else 2
+
+def write(artists, path):
+    """Writes artists (dicts with "id", "name", "flags") to a shard at `path`."""
+    artists = sorted(artists, key=_rank)
+    with_cover = sum(1 for a in artists if a["flags"] & HAS_COVER)
+    with_releases = sum(1 for a in artists if a["flags"] & (HAS_COVER | HAS_RELEASES))
+
+    offsets = array("I", [0])
+    names = bytearray()
+    for artist in artists:
+        names += (artist["name"] or "").encode("utf-8")
+        offsets.append(len(names))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(artists), with_cover, with_releases))
+        f.write(b"".join(uuid.UUID(a["id"]).bytes for a in artists))
+        f.write(bytes(a["flags"] for a in artists))
+        f.write(offsets.tobytes())
+        f.write(names)
+    os.replace(tmp, path)
+
+class ArtistShard:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.with_cover, self.with_releases = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} is not an artist shard")
+        self.ids_at = HEADER.size
+        self.flags_at = self.ids_at + 16 * self.count
+        self.offsets_at = self.flags_at + self.count
+        self.names_at = self.offsets_at + 4 * (self.count + 1)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        start, end = struct.unpack_from("<II", self.map, self.offsets_at + 4 * i)
+        return {
+            "id": str(uuid.UUID(bytes=self.map[self.ids_at + 16 * i:self.ids_at + 16 * (i + 1)])),
+            "name": self.map[self.names_at + start:self.names_at + end].decode("utf-8"),
+            "flags": self.map[self.flags_at + i],
+        }
+
+    def sample(self, rng=random):
+        """A random artist from the best group available: with a cover, else with releases. None if neither."""
+        pool = self.with_cover or self.with_releases
+        return self[rng.randrange(pool)] if pool else None
+
+    def close(self):
+        self.map.close()
+
+def shard_path(country_code, directory=None):
+    return os.path.join(directory or INDEX_DIR, f"{country_code.upper()}.bin")
+
+_shards = {}
+_shards_lock = threading.Lock()
+
+def load_shard(country_code):
+    """The country's shard, or None if it hasn't been built."""
+    with _shards_lock:
+        if country_code not in _shards:
+            path = shard_path(country_code)
+            _shards[country_code] = ArtistShard(path) if os.path.exists(path) else None
+        return _shards[country_code]
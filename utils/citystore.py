@@ -0,0 +1,182 @@
+"""
+Indexed city store built from data/countries+cities.json.
+
+The JSON is 4 MB and has to be parsed whole to find one country. This
+module converts it once into an SQLite file in the state directory, with:
+  - every country's cities stored contiguously, numbered 0..n-1, so a
+    random sample is n random primary-key lookups
+  - a key table mapping normalized country names, ISO alpha-2/alpha-3
+    codes and a few aliases to the country
+
+The store is rebuilt automatically when the source file changes. It is
+keyed by the source's size, mtime and SHA-256: a touched but unchanged
+file (e.g. by a fresh checkout) is reused. To build it ahead of time:
+    python -m utils.citystore
+"""
+import csv
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import unicodedata
+
+from utils.state import state_path
+
+SOURCE_PATH = "data/countries+cities.json"
+CODES_PATH = "data/country_codes.csv"
+STORE_FILE = "cities.sqlite"
+
+# Countries whose name in the cities file doesn't match data/country_codes.csv
+ISO_OVERRIDES = {
+    "Brunei": "BN", "Cape Verde": "CV", "Czech Republic": "CZ",
+    "Democratic Republic of the Congo": "CD", "Fiji Islands": "FJ", "Kosovo": "XK",
+    "Laos": "LA", "Macau S.A.R.": "MO", "Man (Isle of)": "IM", "North Korea": "KP",
+    "Palestinian Territory Occupied": "PS", "Pitcairn Island": "PN", "Russia": "RU",
+    "South Georgia": "GS", "South Korea": "KR", "Svalbard and Jan Mayen Islands": "SJ",
+    "Syria": "SY", "Turkey": "TR", "United Kingdom": "GB", "United States": "US",
+    "Vatican City State (Holy See)": "VA", "Vietnam": "VN", "Wallis and Futuna Islands": "WF",
+}
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE countries (id INTEGER PRIMARY KEY, name TEXT NOT NULL, city_count INTEGER NOT NULL);
+CREATE TABLE country_keys (key TEXT PRIMARY KEY, country_id INTEGER NOT NULL) WITHOUT ROWID;
+CREATE TABLE cities (
+    country_id INTEGER NOT NULL,
+    idx        INTEGER NOT NULL,
+    name       TEXT NOT NULL,
+    PRIMARY KEY (country_id, idx)
+) WITHOUT ROWID;
+"""
+
+def normalize(name):
+    """Lowercase ASCII form of a country name, without parentheticals, "S.A.R." or a leading "The"."""
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().casefold()
+    name = re.sub(r"\(.*?\)|\bs\.a\.r\.|^the\s+", "", name.strip())
+    return re.sub(r"[^a-z0-9]+", " ", name).strip()
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _iso_codes(codes_path):
+    # normalized name (and the part before any comma) -> (alpha-2, alpha-3)
+    codes = {}
+    with open(codes_path, encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            for name in {row["name"], row["name"].split(",")[0]}:
+                codes[normalize(name)] = (row["alpha-2"], row["alpha-3"])
+    return codes
+
+def build(source_path=SOURCE_PATH, store_path=None, codes_path=CODES_PATH):
+    """Converts the cities JSON into an SQLite store; returns its path."""
+    store_path = store_path or state_path(STORE_FILE)
+    with open(source_path, encoding="utf-8") as f:
+        entries = json.load(f)
+    iso = _iso_codes(codes_path)
+    by_alpha2 = {a2: a3 for a2, a3 in iso.values()}
+
+    tmp = f"{store_path}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    with conn:
+        conn.executescript(SCHEMA)
+        for country_id, entry in enumerate(entries):
+            name = entry["name"].strip()
+            cities = entry.get("cities", [])
+            conn.execute("INSERT INTO countries VALUES (?, ?, ?)", (country_id, name, len(cities)))
+            conn.executemany(
+                "INSERT INTO cities VALUES (?, ?, ?)",
+                ((country_id, i, city) for i, city in enumerate(cities))
+            )
+            keys = {normalize(name)}
+            alpha2 = ISO_OVERRIDES.get(name)
+            codes = (alpha2, by_alpha2.get(alpha2)) if alpha2 else iso.get(normalize(name))
+            keys.update(c.lower() for c in codes or () if c)
+            conn.executemany(
+                "INSERT OR IGNORE INTO country_keys VALUES (?, ?)",
+                ((key, country_id) for key in keys)
+            )
+        conn.execute("INSERT INTO meta VALUES ('source', ?)", (_source_stamp(source_path),))
+        conn.execute("INSERT INTO meta VALUES ('sha256', ?)", (_sha256(source_path),))
+    conn.close()
+    os.replace(tmp, store_path)
+    return store_path
+
+class CityStore:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.lock = threading.Lock()
+
+    def meta(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def source_stamp(self):
+        return self.meta("source")
+
+    def find(self, country):
+        """Returns (country_id, city_count) for a country name or ISO code, or None."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT c.id, c.city_count FROM country_keys k JOIN countries c ON c.id = k.country_id WHERE k.key = ?",
+                (normalize(country),)
+            ).fetchone()
+
+    def sample(self, country, k=1, rng=random):
+        """Returns up to `k` distinct random cities of a country, or None if the country is unknown."""
+        found = self.find(country)
+        if not found:
+            return None
+        country_id, count = found
+        picks = rng.sample(range(count), min(k, count))
+        with self.lock:
+            return [
+                self.conn.execute(
+                    "SELECT name FROM cities WHERE country_id = ? AND idx = ?", (country_id, i)
+                ).fetchone()[0]
+                for i in picks
+            ]
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Returns the process-wide store, (re)building it first if the source changed."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            path = state_path(STORE_FILE)
+            if os.path.exists(path):
+                _store = CityStore(path)
+                stamp = _source_stamp(SOURCE_PATH)
+                if _store.source_stamp() != stamp:
+                    sha256 = _store.meta("sha256")
+                    _store.conn.close()
+                    _store = None
+                    # Touched (e.g. by a fresh checkout) but maybe not changed
+                    if sha256 == _sha256(SOURCE_PATH):
+                        conn = sqlite3.connect(path)
+                        with conn:
+                            conn.execute("UPDATE meta SET value = ? WHERE key = 'source'", (stamp,))
+                        conn.close()
+                        _store = CityStore(path)
+            if _store is None:
+                _store = CityStore(build(store_path=path))
+        return _store
+
+if __name__ == "__main__":
+    path = build()
+    print(f"Wrote city store to {path}")
@@ -0,0 +1,155 @@
+"""
+Compiled, column-oriented copies of the CSV files under data/.
+
+Modules that only need a row or a column of a CSV shouldn't pay for
+importing pandas and parsing the whole file on every run. The first
+`load()` of a CSV compiles it into one typed NumPy `.npy` file per column
+in the state directory; later loads memory-map those files, so reading a
+column or a row copies nothing up front. NumPy itself is only imported
+once a dataset is compiled or one of its columns is read.
+
+Compiled copies are keyed by the source's mtime and SHA-256: a touched
+but unchanged file is reused, an edited one is recompiled.
+
+Column types are inferred: int64 when every value is an integer, float64
+when every value is a number or empty (empty -> NaN), otherwise a
+fixed-width unicode string (empty stays ""). Only empty fields count as
+missing, so codes like "NA" (Namibia) are kept as text.
+
+Usage:
+    from utils import datasets
+    ds = datasets.load("data/country_codes.csv")
+    codes = ds.column("alpha-2")   # read-only, memory-mapped array
+    row = ds.row(17)               # {"name": ..., "alpha-2": ..., ...}
+"""
+import csv
+import hashlib
+import json
+import os
+import random
+import shutil
+import threading
+
+from utils.state import state_path
+
+DATASETS_DIR = "datasets"
+FORMAT = 1  # bump to recompile everything after changing the layout
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _is_int(value):
+    try:
+        int(value)
+        return True
+    except ValueError:
+        return False
+
+def _is_float(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+def _to_array(values):
+    import numpy as np
+
+    if values and all(_is_int(v) for v in values):
+        return np.array([int(v) for v in values], dtype=np.int64)
+    if any(values) and all(v == "" or _is_float(v) for v in values):
+        return np.array([float(v) if v else np.nan for v in values], dtype=np.float64)
+    return np.array(values, dtype=str)
+
+def compile_csv(source, target):
+    """Compiles `source` into one .npy per column plus meta.json in the `target` directory."""
+    import numpy as np
+
+    with open(source, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = [row for row in reader if row]
+
+    tmp = f"{target}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    columns = []
+    for i, name in enumerate(header):
+        array = _to_array([row[i] if i < len(row) else "" for row in rows])
+        np.save(os.path.join(tmp, f"{i}.npy"), array)
+        columns.append({"name": name, "dtype": str(array.dtype)})
+
+    meta = {
+        "format": FORMAT,
+        "source": source,
+        "mtime": os.stat(source).st_mtime,
+        "sha256": _sha256(source),
+        "rows": len(rows),
+        "columns": columns,
+    }
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    return meta
+
+class Dataset:
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+        self.columns = [c["name"] for c in meta["columns"]]
+        self._arrays = {}
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def column(self, name):
+        """The column as a read-only, memory-mapped NumPy array."""
+        if name not in self._arrays:
+            import numpy as np
+
+            i = self.columns.index(name)
+            self._arrays[name] = np.load(os.path.join(self.directory, f"{i}.npy"), mmap_mode="r")
+        return self._arrays[name]
+
+    def row(self, i):
+        """Row `i` as a dict of plain Python values."""
+        return {name: self.column(name)[i].item() for name in self.columns}
+
+    def sample_row(self, rng=random):
+        return self.row(rng.randrange(len(self)))
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+def load(source):
+    """Returns the compiled Dataset for a CSV file, compiling it first if needed."""
+    with _loaded_lock:
+        if source in _loaded:
+            return _loaded[source]
+
+        name = os.path.splitext(os.path.basename(source))[0].replace(" ", "_")
+        directory = os.path.join(state_path(DATASETS_DIR), name)
+        meta_path = os.path.join(directory, "meta.json")
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+
+        mtime = os.stat(source).st_mtime
+        if meta and meta["format"] == FORMAT and meta["source"] == source and meta["mtime"] != mtime:
+            # Touched (e.g. by a fresh checkout) but maybe not changed
+            if meta["sha256"] == _sha256(source):
+                meta["mtime"] = mtime
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump(meta, f, ensure_ascii=False)
+        if not meta or meta["format"] != FORMAT or meta["source"] != source or meta["mtime"] != mtime:
+            meta = compile_csv(source, directory)
+
+        _loaded[source] = Dataset(directory, meta)
+        return _loaded[source]
@@ -0,0 +1,93 @@
+import queue
+import threading
+
+class NoContent(Exception):
+    """
+    Raised by a module's generate() when it has nothing to send today. The
+    message is sent in place of the output, but isn't kept in the outbox,
+    so a re-run on the same date tries the module again.
+    """
+
+class OrderedDelivery:
+    """
+    Sends module outputs as soon as they are ready, optionally keeping a
+    declared order.
+
+    A finished output whose name appears in `order` is held back only until
+    every name before it in `order` has been sent or has failed. Names that
+    aren't in `order` are sent straight away.
+
+    Parameters:
+        send (callable): Called as `send(name, output)` to deliver an output.
+        order (list): Names in bulletin order. Names that won't run this time
+            must be left out, otherwise everything after them waits until
+            `close()`.
+    """
+
+    def __init__(self, send, order=None):
+        self.send = send
+        self.order = list(order or [])
+        self.held = {}
+        self.resolved = set()
+
+    def _flush(self):
+        for name in self.order:
+            if name in self.held:
+                self.send(name, self.held.pop(name))
+                self.resolved.add(name)
+            elif name not in self.resolved:
+                break
+
+    def ready(self, name, output):
+        if name not in self.order:
+            self.send(name, output)
+            return
+        self.held[name] = output
+        self._flush()
+
+    def failed(self, name):
+        self.resolved.add(name)
+        self._flush()
+
+    def close(self):
+        """Sends everything still held back, in order."""
+        for name in self.order:
+            if name in self.held:
+                self.send(name, self.held.pop(name))
+            self.resolved.add(name)
+
+class BackgroundDelivery:
+    """
+    An OrderedDelivery that sends from its own thread, so whoever reports
+    outputs (e.g. the loop over run_jobs) never waits on Telegram.
+
+    ready() and failed() only queue the event; the sender thread handles
+    events one at a time, in the order they were queued. close() sends
+    what's still held back and waits until everything has gone out.
+    """
+
+    def __init__(self, send, order=None):
+        self.delivery = OrderedDelivery(send, order)
+        self.events = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="delivery", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            method, args = self.events.get()
+            try:
+                getattr(self.delivery, method)(*args)
+            except Exception as e:
+                print(f"[DELIVERY] {method}{args[:1]} failed: {e}")
+            if method == "close":
+                return
+
+    def ready(self, name, output):
+        self.events.put(("ready", (name, output)))
+
+    def failed(self, name):
+        self.events.put(("failed", (name,)))
+
+    def close(self):
+        self.events.put(("close", ()))
+        self.thread.join()
@@ -0,0 +1,85 @@
+import contextvars
+import queue
+import threading
+import time
+
+from utils.retry import RETRY_ON, CircuitOpenError, RetryError, get_breaker
+
+def first_success(attempt, attempts=10, parallelism=4, validate=None, budget=None, breaker=None, label=None):
+    """
+    Runs up to `attempts` candidate attempts, `parallelism` at a time, and
+    returns as soon as one of them passes validation.
+
+    Meant for sources probed by trial and error (random IDs, random words):
+    instead of trying candidates one after another, several are in flight
+    at once. Once a winner is found no new attempts start, and attempts
+    still running are left to finish in the background (daemon threads)
+    with their results ignored.
+
+    Parameters:
+        attempt (callable): Called as `attempt(i)` for the i-th candidate.
+            Returning None, or raising, counts as a miss.
+        attempts (int): Max number of candidates to try.
+        parallelism (int): Max attempts in flight at once.
+        validate (callable): `validate(result)` must be true for a result
+            to win. Defaults to "not None".
+        budget (float): Overall seconds to wait for a winner.
+        breaker (str): Circuit breaker name (see utils.retry). Only network
+            errors and retryable statuses count against it, not misses.
+        label (str): Prefix for log lines.
+
+    Returns:
+        (result, tried): the winning result and how many attempts were
+        started to get it.
+
+    Raises:
+        RetryError if no attempt succeeded (CircuitOpenError if the breaker
+        opened on the way).
+    """
+    validate = validate or (lambda result: result is not None)
+    breaker = get_breaker(breaker) if isinstance(breaker, str) else breaker
+    label = label or getattr(attempt, "__name__", "attempt")
+    deadline = time.monotonic() + budget if budget is not None else None
+    results = queue.Queue()
+    started = running = 0
+    last = None
+
+    def run(i):
+        try:
+            results.put((i, attempt(i), None))
+        except Exception as e:
+            results.put((i, None, e))
+
+    while True:
+        while running < parallelism and started < attempts:
+            if breaker and not breaker.allow():
+                break
+            # Each attempt runs in a copy of our context so that per-module
+            # accounting (utils.metrics) still knows who it belongs to
+            ctx = contextvars.copy_context()
+            threading.Thread(target=ctx.run, args=(run, started), daemon=True).start()
+            started += 1
+            running += 1
+
+        if running == 0:
+            if breaker and not breaker.allow():
+                raise CircuitOpenError(f"[{label}] {breaker.name} is unavailable (circuit open)", last)
+            raise RetryError(f"[{label}] No success in {started} attempts", last)
+
+        wait = max(0, deadline - time.monotonic()) if deadline is not None else None
+        try:
+            i, result, error = results.get(timeout=wait)
+        except queue.Empty:
+            raise RetryError(f"[{label}] No success within {budget}s ({started} attempts)", last)
+        running -= 1
+
+        if error is not None:
+            last = error
+            if breaker and isinstance(error, RETRY_ON):
+                breaker.record_failure()
+            continue
+        if breaker:
+            breaker.record_success()
+        if validate(result):
+            print(f"[{label}] Success after {started} attempts started (winner #{i + 1})")
+            return result, started
@@ -0,0 +1,173 @@
+"""
+Shared HTTP client for the whole bot.
+
+One pooled `requests.Session` is reused by every module and helper, so
+connections (and TLS handshakes) are kept alive across calls. On top of
+plain requests it adds:
+  - a default (connect, read) timeout on every call
+  - gzip/deflate, plus brotli when the `brotli` package is installed
+  - a cap on concurrent requests per host, and a request rate for hosts
+    that publish one (MusicBrainz: 1 req/s)
+  - one User-Agent policy instead of ad hoc headers in each module
+  - an on-disk cache for slow-changing GETs (see utils.httpcache)
+
+Usage:
+    from utils import http
+    res = http.get(url, params={...})
+    res = http.get(url, cache_ttl=3600)  # cache a URL not in httpcache.TTL_RULES
+    res = http.get(url, cache=False)     # always go to the network
+"""
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.models import PreparedRequest
+
+from utils import httpcache
+from utils.ratelimit import TokenBucket
+
+DEFAULT_TIMEOUT = (10, 30)  # seconds: (connect, read)
+
+USER_AGENT = "BIRD/1.0 (+https://github.com/AkiraOkuno/bird)"
+BROWSER_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36"
+)
+# Hosts that only answer browser-looking clients. Everything else (notably
+# Wikimedia and MusicBrainz, which ask for it) gets the descriptive bot UA.
+# A User-Agent passed explicitly in `headers` always wins.
+HOST_USER_AGENTS = {
+    "core.ac.uk": BROWSER_USER_AGENT,
+    "xeno-canto.org": BROWSER_USER_AGENT,
+    "panelinha.com.br": BROWSER_USER_AGENT,
+}
+
+# Max requests in flight per host; hosts not listed get DEFAULT_HOST_LIMIT.
+DEFAULT_HOST_LIMIT = 6
+HOST_LIMITS = {
+    "musicbrainz.org": 2,
+    "xeno-canto.org": 2,
+    "core.ac.uk": 4,
+}
+
+# Max requests per second per host, shared by every caller. Cache hits
+# don't count. A 429/503 answer holds the host back for its Retry-After.
+HOST_RATES = {
+    "musicbrainz.org": 1.0,
+}
+
+try:
+    import brotli  # noqa: F401  (urllib3 decodes "br" when this is installed)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+def _host_setting(table, host, default):
+    # Matches the host itself or any parent domain ("api.x.org" -> "x.org")
+    parts = host.split(".")
+    for i in range(len(parts) - 1):
+        value = table.get(".".join(parts[i:]))
+        if value is not None:
+            return value
+    return default
+
+class Client(requests.Session):
+    def __init__(self, pool_size=16):
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept-Encoding": ACCEPT_ENCODING,
+        })
+        self._slots = {}
+        self._buckets = {}
+        self._slots_lock = threading.Lock()
+
+    def _host_slot(self, host):
+        with self._slots_lock:
+            if host not in self._slots:
+                limit = _host_setting(HOST_LIMITS, host, DEFAULT_HOST_LIMIT)
+                self._slots[host] = threading.BoundedSemaphore(limit)
+                rate = _host_setting(HOST_RATES, host, None)
+                self._buckets[host] = TokenBucket(rate) if rate else None
+            return self._slots[host]
+
+    def _send(self, host, method, url, headers, kwargs):
+        with self._host_slot(host):
+            bucket = self._buckets[host]
+            if bucket:
+                bucket.acquire()
+            response = super().request(method, url, headers=headers, **kwargs)
+            if bucket and response.status_code in (429, 503):
+                retry_after = response.headers.get("Retry-After", "")
+                bucket.pause(float(retry_after) if retry_after.isdigit() else 1)
+            return response
+
+    def request(self, method, url, headers=None, timeout=None, cache=True, cache_ttl=None, **kwargs):
+        host = (urlsplit(url).hostname or "").lower()
+        headers = dict(headers or {})
+        if not any(k.lower() == "user-agent" for k in headers):
+            user_agent = _host_setting(HOST_USER_AGENTS, host, None)
+            if user_agent:
+                headers["User-Agent"] = user_agent
+        kwargs["timeout"] = timeout or DEFAULT_TIMEOUT
+
+        store = httpcache.get_cache() if cache and method.upper() == "GET" and not kwargs.get("stream") else None
+        if store is not None:
+            prepared = PreparedRequest()
+            prepared.prepare_url(url, kwargs.pop("params", None))
+            ttl = cache_ttl if cache_ttl is not None else httpcache.ttl_for(prepared.url)
+            if ttl:
+                return self._cached_get(store, host, prepared.url, ttl, headers, kwargs)
+            url = prepared.url
+
+        return self._send(host, method, url, headers, kwargs)
+
+    def _cached_get(self, store, host, url, ttl, headers, kwargs):
+        entry = store.lookup(url)
+        if entry and entry["expires"] > time.time():
+            store.touch(url)
+            store._count("hits")
+            return httpcache.to_response(entry)
+
+        # Stale entry: ask the server whether it changed
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = self._send(host, "GET", url, headers, kwargs)
+
+        if entry and response.status_code == 304:
+            store.touch(url, ttl)
+            store._count("revalidated")
+            return httpcache.to_response(entry)
+        store._count("misses")
+        if response.status_code == 200:
+            store.store(url, response, ttl)
+        return response
+
+_client = None
+_client_lock = threading.Lock()
+
+def session():
+    """Returns the process-wide client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = Client()
+        return _client
+
+def get(url, **kwargs):
+    return session().get(url, **kwargs)
+
+def post(url, **kwargs):
+    return session().post(url, **kwargs)
+
+def head(url, **kwargs):
+    return session().head(url, **kwargs)
@@ -0,0 +1,161 @@
+"""
+Persistent HTTP response cache used by utils.http.
+
+Only GET requests whose URL matches one of the TTL_RULES are cached (or
+calls that pass `cache_ttl` explicitly). A fresh entry is served without
+touching the network. Once it expires, the next request revalidates it with
+If-None-Match / If-Modified-Since, so an unchanged resource costs a 304
+instead of a full download. The store is an SQLite file in the state
+directory, capped in size with least-recently-used eviction.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from utils.state import state_path
+
+CACHE_FILE = "http_cache.sqlite"
+MAX_BYTES = int(float(os.environ.get("HTTP_CACHE_MB", "200")) * 1024 * 1024)
+ENABLED = os.environ.get("HTTP_CACHE", "1") != "0"
+
+DAY = 24 * 3600
+# (URL pattern, TTL in seconds); the first match wins
+TTL_RULES = [
+    (r"^https://restcountries\.com/v3\.1/", 30 * DAY),
+    (r"^https://www\.wikidata\.org/wiki/Special:EntityData/", 30 * DAY),
+    (r"^https://en\.wikipedia\.org/api/rest_v1/page/summary/", 7 * DAY),
+    (r"^https://xeno-canto\.org/species/", 30 * DAY),
+    (r"^https://xeno-canto\.org/\d+$", 30 * DAY),  # recording pages, not /download
+    (r"^https://musicbrainz\.org/ws/2/release-group\?", 7 * DAY),
+    (r"^https://raw\.githubusercontent\.com/hermitdave/FrequencyWords/", 90 * DAY),
+]
+
+# Hop-by-hop or encoding headers that don't describe the stored (decoded) body
+DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url           TEXT PRIMARY KEY,
+    status        INTEGER NOT NULL,
+    headers       TEXT NOT NULL,
+    body          BLOB NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    expires       REAL NOT NULL,
+    accessed      REAL NOT NULL,
+    size          INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+"""
+
+def ttl_for(url):
+    for pattern, ttl in TTL_RULES:
+        if re.search(pattern, url):
+            return ttl
+    return None
+
+class HttpCache:
+    def __init__(self, path=None, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path or state_path(CACHE_FILE), check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.executescript(SCHEMA)
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def lookup(self, url):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status, headers, body, etag, last_modified, expires FROM entries WHERE url = ?",
+                (url,)
+            ).fetchone()
+        if not row:
+            return None
+        status, headers, body, etag, last_modified, expires = row
+        return {
+            "url": url, "status": status, "headers": json.loads(headers), "body": body,
+            "etag": etag, "last_modified": last_modified, "expires": expires,
+        }
+
+    def touch(self, url, ttl=None):
+        # Marks an entry as used (for LRU) and, after a 304, fresh again
+        with self.lock, self.conn:
+            if ttl is None:
+                self.conn.execute("UPDATE entries SET accessed = ? WHERE url = ?", (time.time(), url))
+            else:
+                self.conn.execute(
+                    "UPDATE entries SET accessed = ?, expires = ? WHERE url = ?",
+                    (time.time(), time.time() + ttl, url)
+                )
+
+    def store(self, url, response, ttl):
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in DROP_HEADERS}
+        body = response.content
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url, response.status_code, json.dumps(headers), body,
+                    response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                    time.time() + ttl, time.time(), len(body)
+                )
+            )
+            self.stats["stored"] += 1
+            self._evict()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until we're back under 90% of the cap
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        for url, size in self.conn.execute("SELECT url, size FROM entries ORDER BY accessed").fetchall():
+            if freed >= target:
+                break
+            self.conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+            freed += size
+            self.stats["evicted"] += 1
+
+    def summary(self):
+        s = self.stats
+        return (
+            f"[HTTP CACHE] hits={s['hits']} revalidated={s['revalidated']} "
+            f"misses={s['misses']} stored={s['stored']} evicted={s['evicted']}"
+        )
+
+def to_response(entry, request=None):
+    """Rebuilds a requests.Response from a cache entry."""
+    response = requests.Response()
+    response.status_code = entry["status"]
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    response._content = entry["body"]
+    response.url = entry["url"]
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.request = request
+    response.from_cache = True
+    return response
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Returns the process-wide cache, or None if caching is disabled (HTTP_CACHE=0)."""
+    global _cache
+    if not ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache()
+        return _cache
@@ -0,0 +1,185 @@
+"""
+Per-module resource accounting.
+
+Every module run records wall time, CPU time, peak traced memory and the
+number/size of HTTP responses it received. Each daily run appends one line
+per module to a JSONL trend store in the state directory, and
+`python -m utils.metrics` compares the latest run against a rolling
+baseline to flag regressions.
+"""
+import argparse
+import contextvars
+import datetime
+import json
+import os
+import statistics
+import threading
+import time
+import tracemalloc
+
+from utils.state import state_path
+
+TREND_FILE = "metrics.jsonl"
+FIELDS = ["wall_s", "cpu_s", "peak_kb", "http_calls", "http_bytes"]
+
+# Name of the module the current code runs for. Worker threads started by a
+# module must copy the context (contextvars.copy_context().run) to keep it.
+current_module = contextvars.ContextVar("current_module", default=None)
+
+_stats = {}
+_lock = threading.Lock()
+_running = 0
+
+def start():
+    """Starts memory tracing and HTTP accounting for this process."""
+    if os.environ.get("TRACE_MEMORY", "1") != "0" and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _install_http_hook()
+
+def _install_http_hook():
+    import requests
+
+    if getattr(requests.Session.send, "_metrics_hook", False):
+        return
+    original = requests.Session.send
+
+    def send(self, request, **kwargs):
+        response = original(self, request, **kwargs)
+        try:
+            # Bytes read off the wire (before decompression) when available
+            nbytes = response.raw.tell() if not kwargs.get("stream") else 0
+        except Exception:
+            nbytes = 0
+        if not nbytes and not kwargs.get("stream"):
+            nbytes = len(response.content or b"")
+        record_http(nbytes)
+        return response
+
+    send._metrics_hook = True
+    requests.Session.send = send
+
+def record_http(nbytes):
+    stats = _stats.get(current_module.get())
+    if stats is None:
+        return
+    with _lock:
+        stats["http_calls"] += 1
+        stats["http_bytes"] += nbytes
+
+def measure(name, func):
+    """
+    Wraps `func` so that running it records resource usage under `name`.
+
+    CPU time is the worker thread's own. Memory tracing is process-wide, so
+    when modules overlap `peak_kb` is the highest usage seen while this one
+    ran, not its own share; run with MAX_WORKERS=1 for exact numbers.
+    """
+    def wrapper():
+        global _running
+        stats = {field: 0 for field in FIELDS}
+        _stats[name] = stats
+        current_module.set(name)
+
+        with _lock:
+            if _running == 0 and tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            _running += 1
+
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            return func()
+        finally:
+            stats["wall_s"] = round(time.perf_counter() - wall, 3)
+            stats["cpu_s"] = round(time.thread_time() - cpu, 3)
+            if tracemalloc.is_tracing():
+                stats["peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+            with _lock:
+                _running -= 1
+
+    return wrapper
+
+def save_run(outcomes):
+    """
+    Appends this run's numbers to the trend store.
+
+    Parameters:
+        outcomes (dict): module name -> (status, elapsed seconds) as seen by
+            the scheduler. Abandoned modules never finish measuring, so
+            their wall time comes from here.
+    """
+    now = datetime.datetime.utcnow()
+    with open(state_path(TREND_FILE), "a", encoding="utf-8") as f:
+        for name, (status, elapsed) in outcomes.items():
+            stats = dict(_stats.get(name) or {field: 0 for field in FIELDS})
+            if not stats["wall_s"]:
+                stats["wall_s"] = round(elapsed, 3)
+            record = {
+                "date": now.date().isoformat(),
+                "ts": now.isoformat(timespec="seconds"),
+                "module": name,
+                "status": status,
+                **stats
+            }
+            f.write(json.dumps(record) + "\n")
+
+def load_history():
+    path = state_path(TREND_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def find_regressions(history, days=14, factor=3.0, min_samples=3):
+    """
+    Compares each module's latest record with the median of its records in
+    the `days` days before it.
+
+    Returns a list of (module, field, latest, median) for every field where
+    the latest value is more than `factor` times the baseline median.
+    """
+    by_module = {}
+    for record in history:
+        by_module.setdefault(record["module"], []).append(record)
+
+    regressions = []
+    for module, records in sorted(by_module.items()):
+        latest = records[-1]
+        since = (datetime.date.fromisoformat(latest["date"]) - datetime.timedelta(days=days)).isoformat()
+        baseline = [r for r in records[:-1] if r["date"] >= since and r.get("status") == "ok"]
+        if len(baseline) < min_samples:
+            continue
+        for field in FIELDS:
+            median = statistics.median(r.get(field, 0) for r in baseline)
+            if median > 0 and latest.get(field, 0) > factor * median:
+                regressions.append((module, field, latest[field], median))
+    return regressions
+
+def summary(days=14, factor=3.0):
+    history = load_history()
+    if not history:
+        print("[METRICS] No runs recorded yet.")
+        return []
+
+    last_ts = history[-1]["ts"]
+    print(f"{'module':<20} {'status':<8} {'wall s':>8} {'cpu s':>8} {'peak KB':>9} {'http':>5} {'KB in':>8}")
+    for record in history:
+        if record["ts"] == last_ts:
+            print(
+                f"{record['module']:<20} {record['status']:<8} {record['wall_s']:>8.1f} "
+                f"{record['cpu_s']:>8.1f} {record['peak_kb']:>9} {record['http_calls']:>5} "
+                f"{record['http_bytes'] // 1024:>8}"
+            )
+
+    regressions = find_regressions(history, days=days, factor=factor)
+    for module, field, latest, median in regressions:
+        print(f"[METRICS] ⚠️ {module}: {field} = {latest} vs {days}-day median {median} (>{factor}x)")
+    if not regressions:
+        print(f"[METRICS] No regressions against the {days}-day median.")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize per-module resource usage.")
+    parser.add_argument("--days", type=int, default=14, help="Baseline window in days")
+    parser.add_argument("--factor", type=float, default=3.0, help="Regression threshold over the median")
+    args = parser.parse_args()
+    summary(days=args.days, factor=args.factor)
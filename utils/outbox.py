@@ -0,0 +1,101 @@
+"""
+Durable outbox for a day's bulletin.
+
+Module outputs and how far each chat got through them are stored in SQLite,
+keyed by run date. Re-running main.py on the same date reuses the stored
+outputs instead of generating them again, and only sends what each chat
+hasn't received yet.
+
+The state directory ends up in the Actions cache, so secrets that show up
+in outputs (Google Places photo URLs carry the API key) are stored as a
+${NAME} marker and put back from the environment when read.
+"""
+import datetime
+import json
+import os
+import sqlite3
+import threading
+
+from utils.state import state_path
+
+OUTBOX_FILE = "outbox.sqlite"
+KEEP_DAYS = 30
+SECRET_ENV = ["GOOGLE_API_KEY", "TELEGRAM_TOKEN"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    run_date TEXT NOT NULL,
+    module   TEXT NOT NULL,
+    payload  TEXT NOT NULL,
+    created  TEXT NOT NULL,
+    PRIMARY KEY (run_date, module)
+);
+CREATE TABLE IF NOT EXISTS deliveries (
+    run_date TEXT NOT NULL,
+    module   TEXT NOT NULL,
+    chat_id  TEXT NOT NULL,
+    sent     INTEGER NOT NULL,  -- number of items already delivered
+    updated  TEXT NOT NULL,
+    PRIMARY KEY (run_date, module, chat_id)
+);
+"""
+
+def _redact(payload):
+    for name in SECRET_ENV:
+        if os.environ.get(name):
+            payload = payload.replace(os.environ[name], f"${{{name}}}")
+    return payload
+
+def _unredact(payload):
+    for name in SECRET_ENV:
+        if os.environ.get(name):
+            payload = payload.replace(f"${{{name}}}", os.environ[name])
+    return payload
+
+def _now():
+    return datetime.datetime.utcnow().isoformat(timespec="seconds")
+
+class Outbox:
+    def __init__(self, run_date=None, path=None):
+        self.run_date = run_date or datetime.datetime.utcnow().date().isoformat()
+        # Chats are served from several threads, so share one guarded connection
+        self.conn = sqlite3.connect(path or state_path(OUTBOX_FILE), check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.executescript(SCHEMA)
+            cutoff = (datetime.date.fromisoformat(self.run_date) - datetime.timedelta(days=KEEP_DAYS)).isoformat()
+            self.conn.execute("DELETE FROM outputs WHERE run_date < ?", (cutoff,))
+            self.conn.execute("DELETE FROM deliveries WHERE run_date < ?", (cutoff,))
+
+    def get_output(self, module):
+        """Returns the stored output of `module` for this run date, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT payload FROM outputs WHERE run_date = ? AND module = ?",
+                (self.run_date, module)
+            ).fetchone()
+        return json.loads(_unredact(row[0])) if row else None
+
+    def save_output(self, module, output):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?)",
+                (self.run_date, module, _redact(json.dumps(output, ensure_ascii=False)), _now())
+            )
+
+    def progress(self, module, chat_ids):
+        """Returns {chat_id: number of items already delivered} for `module`."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT chat_id, sent FROM deliveries WHERE run_date = ? AND module = ?",
+                (self.run_date, module)
+            ).fetchall()
+        sent = dict(rows)
+        return {chat_id: sent.get(chat_id, 0) for chat_id in chat_ids}
+
+    def mark_sent(self, module, chat_id, sent):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO deliveries VALUES (?, ?, ?, ?, ?)",
+                (self.run_date, module, chat_id, sent, _now())
+            )
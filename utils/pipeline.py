@@ -0,0 +1,68 @@
+import threading
+
+class Pipeline:
+    """
+    A chain of stages that each candidate goes through, with its own
+    concurrency limit per stage and hit-rate accounting.
+
+    Pair it with utils.hedge.first_success to keep several candidates in
+    flight: a candidate waiting on a slow or rate-limited stage doesn't
+    hold slots in the others, so while one candidate is in a late stage
+    the next ones are already going through the early stages.
+
+    Usage:
+        pipeline = Pipeline([
+            ("artist", pick_artist, 2),   # (name, func, max concurrent)
+            ("track", pick_track, 2),
+            ("cover", find_cover, 4),
+        ], label="SONG")
+        found, tried = first_success(pipeline.run, attempts=100, parallelism=6)
+        pipeline.close()
+        print(pipeline.report())
+
+    The first stage is called with the attempt number, each later stage
+    with the previous stage's result. A None result or an exception drops
+    the candidate (exceptions are re-raised to the caller).
+    """
+
+    def __init__(self, stages, label="PIPELINE"):
+        self.stages = [(name, func, threading.BoundedSemaphore(limit)) for name, func, limit in stages]
+        self.label = label
+        self.stats = {name: {"in": 0, "out": 0, "errors": 0} for name, _, _ in stages}
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+
+    def _count(self, name, key):
+        with self.lock:
+            self.stats[name][key] += 1
+
+    def run(self, value):
+        for name, func, slots in self.stages:
+            with slots:
+                # Candidates still in flight once a winner is found stop here
+                if self.closed.is_set():
+                    return None
+                self._count(name, "in")
+                try:
+                    value = func(value)
+                except Exception:
+                    self._count(name, "errors")
+                    raise
+            if value is None:
+                return None
+            self._count(name, "out")
+        return value
+
+    def close(self):
+        """Lets candidates still in flight finish their current stage and go no further."""
+        self.closed.set()
+
+    def report(self):
+        """One line of per-stage hit rates, e.g. "[SONG] artist 9/10 (90%), track 4/9 (44%, 1 errors)"."""
+        parts = []
+        with self.lock:
+            for name, s in self.stats.items():
+                rate = f"{100 * s['out'] // s['in']}%" if s["in"] else "-"
+                errors = f", {s['errors']} errors" if s["errors"] else ""
+                parts.append(f"{name} {s['out']}/{s['in']} ({rate}{errors})")
+        return f"[{self.label}] " + ", ".join(parts)
@@ -1,24 +1,146 @@
+import random
+import threading
 import time
 
-def try_with_retries(func, attempts=5, delay=5, *args, **kwargs):
+from requests.exceptions import ConnectionError, Timeout
+
+# Statuses worth trying again: the server is busy, rate limiting or briefly broken
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+class RetryableError(Exception):
+    """Raise from a retried function to ask for another attempt."""
+
+class RetryableStatus(RetryableError):
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code} from {response.url}")
+        self.response = response
+
+class RetryError(Exception):
+    """All attempts failed (or the time budget ran out). `last` is the last error."""
+
+    def __init__(self, message, last=None):
+        super().__init__(message)
+        self.last = last
+
+class CircuitOpenError(RetryError):
+    """The source's circuit breaker is open, so no attempt was made."""
+
+# Errors retried by default: network trouble, timeouts and explicit requests
+RETRY_ON = (ConnectionError, Timeout, RetryableError)
+
+def check_status(response):
+    """Raises RetryableStatus for statuses in RETRYABLE_STATUS, otherwise returns the response."""
+    if response.status_code in RETRYABLE_STATUS:
+        raise RetryableStatus(response)
+    return response
+
+class CircuitBreaker:
+    """
+    Stops calling a source after `threshold` failures in a row. Once
+    `reset_after` seconds have passed, one trial call is let through: if it
+    succeeds the breaker closes again, otherwise it stays open.
+    """
+
+    def __init__(self, name, threshold=5, reset_after=120):
+        self.name = name
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_after:
+                # Half-open: let this call through as a trial
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    print(f"[RETRY] Circuit open for {self.name} after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name):
+    """Returns the process-wide circuit breaker for `name` (usually a host)."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+def backoff_delay(attempt, base_delay=1, max_delay=30, jitter=True):
+    """Exponential backoff for the given 0-based attempt, with "full jitter" if enabled."""
+    delay = min(max_delay, base_delay * 2 ** attempt)
+    return random.uniform(0, delay) if jitter else delay
+
+def retry(func, *args, attempts=5, base_delay=1, max_delay=30, jitter=True, budget=None,
+          retry_on=RETRY_ON, none_is_failure=True, breaker=None, **kwargs):
     """
-    Repeatedly calls `func(*args, **kwargs)` until it returns a non-None result
-    or the max number of attempts is reached.
+    Calls `func(*args, **kwargs)` until it succeeds, backing off between attempts.
 
     Parameters:
         func (callable): The function to call.
         attempts (int): Max number of attempts.
-        delay (int): Delay in seconds between failed attempts.
+        base_delay, max_delay (float): Backoff starts at `base_delay`
+            seconds and doubles per attempt, capped at `max_delay`.
+        jitter (bool): Sleep a random time up to the backoff ("full jitter").
+        budget (float): Overall seconds this call site may take; no new
+            attempt is started if its backoff would overrun it.
+        retry_on (tuple): Exception types that count as a failed attempt
+            (RetryableError always does). Anything else is raised straight away.
+        none_is_failure (bool): Treat a None result as a failed attempt.
+        breaker (str or CircuitBreaker): Circuit breaker (by name, usually
+            the host) shared by every call site hitting the same source.
         *args, **kwargs: Passed to the function.
 
     Returns:
-        The first non-None result or None if all fail.
+        The first successful result.
+
+    Raises:
+        RetryError if every attempt failed or the budget ran out;
+        CircuitOpenError if the breaker is open.
     """
+    if isinstance(breaker, str):
+        breaker = get_breaker(breaker)
+    retry_on = tuple(retry_on) + (RetryableError,)
+    deadline = time.monotonic() + budget if budget is not None else None
+    last = None
+
     for i in range(attempts):
-        result = func(*args, **kwargs)
-        if result is not None:
+        if breaker and not breaker.allow():
+            raise CircuitOpenError(f"{breaker.name} is unavailable (circuit open)", last)
+
+        try:
+            result = func(*args, **kwargs)
+            if result is None and none_is_failure:
+                raise RetryableError(f"{getattr(func, '__name__', func)} returned None")
+            if breaker:
+                breaker.record_success()
             return result
+        except retry_on as e:
+            last = e
+            if breaker:
+                breaker.record_failure()
+
         if i < attempts - 1:
-            print(f"Attempt {i+1} failed, retrying in {delay} seconds...")
+            delay = backoff_delay(i, base_delay, max_delay, jitter)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise RetryError(f"Gave up after {i + 1} attempts: time budget of {budget}s ran out", last)
+            print(f"Attempt {i+1} failed ({last}), retrying in {delay:.1f} seconds...")
             time.sleep(delay)
-    return None
+
+    raise RetryError(f"All {attempts} attempts failed", last)
@@ -0,0 +1,102 @@
+"""
+Weighted random sampling shared by the modules.
+
+AliasTable implements Vose's alias method: O(n) to build from a weight
+array, then O(1) per draw, however skewed the weights. UnseenSampler
+draws without replacement *across runs*: the indices already drawn are
+kept in the state directory and skipped until every item has come up once.
+
+Every draw takes an `rng` (default: the `random` module) so callers and
+tests can pass a seeded generator from make_rng().
+
+Usage:
+    from utils.sampling import AliasTable
+    table = AliasTable([30, 50, 20])
+    i = table.draw()               # 0, 1 or 2 with probability .3/.5/.2
+    batch = table.draws(10, rng=make_rng(42))
+"""
+import os
+import random
+from array import array
+
+from utils.state import load_json, save_json
+
+def make_rng(seed=None):
+    """A random.Random seeded with `seed`, or with SAMPLING_SEED when set (else from the OS)."""
+    if seed is None and os.environ.get("SAMPLING_SEED"):
+        seed = os.environ["SAMPLING_SEED"]
+    return random.Random(seed)
+
+class AliasTable:
+    def __init__(self, weights):
+        weights = [float(w) for w in weights]
+        n = len(weights)
+        total = sum(weights)
+        if n == 0 or total <= 0 or any(w < 0 for w in weights):
+            raise ValueError("weights must be non-negative with a positive sum")
+
+        # Scale so the average weight is 1, then pair each "small" column
+        # with a "large" one that tops it up to exactly 1
+        scaled = [w * n / total for w in weights]
+        self.prob = array("d", [0.0]) * n
+        self.alias = array("l", [0]) * n
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1
+            (small if scaled[l] < 1 else large).append(l)
+        # Leftovers are 1 up to floating point error
+        for i in small + large:
+            self.prob[i] = 1.0
+            self.alias[i] = i
+
+    def __len__(self):
+        return len(self.prob)
+
+    def draw(self, rng=random):
+        """One index, drawn with probability proportional to its weight."""
+        i = rng.randrange(len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+    def draws(self, k, rng=random):
+        """`k` independent draws (with replacement)."""
+        return [self.draw(rng) for _ in range(k)]
+
+class UnseenSampler:
+    """
+    Weighted draws that don't repeat across runs until every item has been
+    drawn. The seen set is stored as state file `seen_<name>.json`, and is
+    reset when the number of items changes or all of them have been seen.
+    """
+
+    MAX_REJECTIONS = 32
+
+    def __init__(self, name, weights):
+        self.file = f"seen_{name}.json"
+        self.weights = [float(w) for w in weights]
+        self.table = AliasTable(self.weights)
+        state = load_json(self.file, {})
+        seen = state.get("seen", []) if state.get("size") == len(self.weights) else []
+        self.seen = set(seen)
+
+    def draw(self, rng=random):
+        candidates = [i for i, w in enumerate(self.weights) if w > 0]
+        if self.seen.issuperset(candidates):
+            self.seen.clear()
+
+        # Rejection is cheap while most items are unseen; past that, draw
+        # exactly from a table over the unseen ones
+        for _ in range(self.MAX_REJECTIONS):
+            i = self.table.draw(rng)
+            if i not in self.seen:
+                break
+        else:
+            unseen = [i for i in candidates if i not in self.seen]
+            i = unseen[AliasTable([self.weights[j] for j in unseen]).draw(rng)]
+
+        self.seen.add(i)
+        save_json(self.file, {"size": len(self.weights), "seen": sorted(self.seen)})
+        return i
@@ -0,0 +1,66 @@
+import queue
+import threading
+import time
+
+
+def _run_job(name, func, results):
+    try:
+        results.put((name, func(), None))
+    except Exception as e:
+        results.put((name, None, e))
+
+
+def run_jobs(jobs, max_workers=4):
+    """
+    Runs jobs concurrently and yields their outcomes as they finish.
+
+    Each job gets its own daemon thread, and at most `max_workers` run at
+    the same time. A job's deadline is wall-clock time measured from the
+    moment it starts; when it runs out the job is abandoned: its slot is
+    given to the next pending job and whatever it returns later is ignored.
+    Python threads can't be killed, but daemon threads don't keep the
+    interpreter alive, so an abandoned job never holds up the run.
+
+    Parameters:
+        jobs (list): (name, func, deadline) tuples. `deadline` is in
+            seconds, or None for no limit. Names must be unique.
+        max_workers (int): Max number of jobs running at once.
+
+    Yields:
+        (name, result, error, elapsed) tuples, in completion order.
+        `error` is the exception raised by the job, a TimeoutError if it
+        ran out of time, or None on success.
+    """
+    results = queue.Queue()
+    pending = list(jobs)
+    running = {}  # name -> (deadline, start)
+
+    while pending or running:
+        while pending and len(running) < max(1, max_workers):
+            name, func, deadline = pending.pop(0)
+            thread = threading.Thread(
+                target=_run_job, args=(name, func, results),
+                name=f"job-{name}", daemon=True
+            )
+            running[name] = (deadline, time.monotonic())
+            thread.start()
+
+        expiries = [start + deadline for deadline, start in running.values() if deadline is not None]
+        wait = max(0, min(expiries) - time.monotonic()) if expiries else None
+
+        try:
+            name, result, error = results.get(timeout=wait)
+        except queue.Empty:
+            now = time.monotonic()
+            for name, (deadline, start) in list(running.items()):
+                if deadline is not None and now >= start + deadline:
+                    del running[name]
+                    error = TimeoutError(f"abandoned after {deadline}s")
+                    yield name, None, error, now - start
+            continue
+
+        if name not in running:
+            # Late result from a job that was already abandoned
+            continue
+        deadline, start = running.pop(name)
+        yield name, result, error, time.monotonic() - start
@@ -0,0 +1,86 @@
+"""
+Local snapshots of slow-changing remote datasets.
+
+A snapshot is a JSON dict with a "built" timestamp, produced by a `build()`
+function. The committed copy lives under data/ (regenerated by a script in
+misc/); refreshes made at runtime are written to the state directory, and
+whichever copy is newer wins. A runtime build that fails isn't tried
+again for a while, so a run without a committed copy doesn't keep paying
+for a remote that's down or timing out.
+"""
+import datetime
+import json
+import os
+import threading
+import time
+
+from utils.state import load_json, save_json, state_path
+
+# Snapshot name -> time of the last failed runtime build
+FAILURES_FILE = "snapshot_failures.json"
+RETRY_AFTER = 24 * 3600
+
+def now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+
+def save(data, path):
+    """Atomically writes a snapshot as compact JSON."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def _read(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def age_days(data):
+    built = datetime.datetime.fromisoformat(data["built"])
+    return (datetime.datetime.now(datetime.timezone.utc) - built).total_seconds() / 86400
+
+class Snapshot:
+    """
+    Parameters:
+        data_path (str): Committed copy, e.g. "data/country_facts.json".
+        build (callable): Returns a fresh snapshot dict (with "built").
+        max_age_days (float): Rebuild at runtime once the newest copy is
+            older than this. None never rebuilds an existing snapshot.
+    """
+
+    def __init__(self, data_path, build, max_age_days=None):
+        self.data_path = data_path
+        self.state_name = os.path.basename(data_path)
+        self.build = build
+        self.max_age_days = max_age_days
+        self.data = None
+        self.refreshed = False  # one refresh attempt per run
+        self.lock = threading.Lock()
+
+    def get(self):
+        """Returns the newest snapshot, refreshing it first if missing or stale; None if there is none."""
+        with self.lock:
+            if self.data is None:
+                copies = [_read(self.data_path), _read(state_path(self.state_name))]
+                self.data = max([c for c in copies if c], key=lambda c: c["built"], default=None)
+
+            stale = self.data is None or (self.max_age_days is not None and age_days(self.data) > self.max_age_days)
+            if stale and not self.refreshed:
+                self.refreshed = True
+                failed_at = load_json(FAILURES_FILE, {}).get(self.state_name, 0)
+                if time.time() - failed_at < RETRY_AFTER:
+                    print(f"[SNAPSHOT] Not refreshing {self.state_name}, the last attempt failed")
+                    return self.data
+                try:
+                    data = self.build()
+                    save(data, state_path(self.state_name))
+                    print(f"[SNAPSHOT] Refreshed {self.state_name}")
+                    self.data = data
+                except Exception as e:
+                    print(f"[SNAPSHOT] Refreshing {self.state_name} failed: {e}")
+                    failures = load_json(FAILURES_FILE, {})
+                    failures[self.state_name] = time.time()
+                    save_json(FAILURES_FILE, failures)
+            return self.data
@@ -0,0 +1,28 @@
+import json
+import os
+
+# Local directory for everything the bot keeps between runs (caches, trend
+# stores, outboxes). CI keeps it alive with actions/cache.
+STATE_DIR = os.environ.get("BIRD_STATE_DIR", ".state")
+
+def state_path(name):
+    """Returns the path of `name` inside the state directory, creating the directory."""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    return os.path.join(STATE_DIR, name)
+
+def load_json(name, default=None):
+    """Loads a JSON file from the state directory, or returns `default` if it's missing or unreadable."""
+    path = state_path(name)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def save_json(name, data):
+    """Atomically writes `data` as JSON into the state directory."""
+    path = state_path(name)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
@@ -0,0 +1,93 @@
+"""
+Compact, memory-mapped word list.
+
+A word list is stored as one file: a small header, an array of N+1 uint32
+offsets and one packed UTF-8 blob holding the N words back to back, in
+the order they were given (for frequency lists: most frequent first, so
+the position of a word is its rank). Opening it maps the file instead of
+reading it, and drawing a word only touches two offsets and its bytes, so
+no per-word Python objects are ever built.
+
+Build one from a frequency list ("word count" per line):
+    python -m utils.wordindex pt_full.txt pt_words.idx
+"""
+import mmap
+import os
+import random
+import struct
+import sys
+from array import array
+
+MAGIC = b"BWIX1\0\0\0"
+HEADER = struct.Struct("<8sI")  # magic, word count
+
+def build(words, path):
+    """Writes `words` (an iterable of str, kept in order) to an index file at `path`."""
+    offsets = array("I", [0])
+    blob = bytearray()
+    for word in words:
+        blob += word.encode("utf-8")
+        offsets.append(len(blob))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(offsets) - 1))
+        f.write(offsets.tobytes())
+        f.write(blob)
+    os.replace(tmp, path)
+    return len(offsets) - 1
+
+def read_frequency_list(lines, keep=None):
+    """Yields the first column of a "word count" frequency list, optionally filtered by `keep(word)`."""
+    for line in lines:
+        parts = line.split()
+        if parts and (keep is None or keep(parts[0])):
+            yield parts[0]
+
+class WordIndex:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} is not a word index")
+        self.offsets_at = HEADER.size
+        self.blob_at = HEADER.size + 4 * (self.count + 1)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        start, end = struct.unpack_from("<II", self.map, self.offsets_at + 4 * i)
+        return self.map[self.blob_at + start:self.blob_at + end].decode("utf-8")
+
+    def band(self, skip_top=0, max_rank=None):
+        """The (start, stop) index range left after skipping the `skip_top` most frequent words and everything past `max_rank`."""
+        stop = self.count if max_rank is None else min(max_rank, self.count)
+        return min(skip_top, stop), stop
+
+    def sample(self, k=1, skip_top=0, max_rank=None, rng=random):
+        """Draws `k` distinct words uniformly from the frequency band."""
+        start, stop = self.band(skip_top, max_rank)
+        if stop <= start:
+            return []
+        return [self[i] for i in rng.sample(range(start, stop), min(k, stop - start))]
+
+    def choice(self, skip_top=0, max_rank=None, rng=random):
+        words = self.sample(1, skip_top, max_rank, rng)
+        return words[0] if words else None
+
+    def close(self):
+        self.map.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m utils.wordindex FREQUENCY_LIST OUTPUT")
+    with open(sys.argv[1], encoding="utf-8") as f:
+        n = build(read_frequency_list(f), sys.argv[2])
+    print(f"Wrote {n} words to {sys.argv[2]}")
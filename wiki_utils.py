@@ -1,19 +1,112 @@
-import requests
-from bs4 import BeautifulSoup
+from utils import http
 import hashlib
+import os
 
-def get_country_data(country):
+from utils.snapshot import Snapshot, now_iso
+
+# Facts for every country from one bulk Wikidata query, keyed by ISO alpha-2
+# code (built by misc/build_country_facts.py, see utils.snapshot)
+COUNTRY_FACTS_PATH = "data/country_facts.json"
+# Refresh the snapshot at runtime once it's older than this many days (unset: never)
+COUNTRY_FACTS_MAX_AGE = os.environ.get("COUNTRY_FACTS_MAX_AGE_DAYS")
+
+COUNTRY_FACTS_SPARQL = """
+SELECT ?iso2 ?countryLabel ?pop ?popDate ?headLabel ?img ?officeLabel ?govLabel WHERE {
+  ?country wdt:P297 ?iso2 .
+  FILTER NOT EXISTS { ?country wdt:P576 ?dissolved }
+  OPTIONAL {
+    {
+      SELECT ?country (MAX(?date) AS ?popDate) WHERE {
+        ?country wdt:P297 [] ; p:P1082/pq:P585 ?date .
+      } GROUP BY ?country
+    }
+    ?country p:P1082 ?popStmt .
+    ?popStmt ps:P1082 ?pop ; pq:P585 ?popDate .
+  }
+  OPTIONAL { ?country wdt:P35 ?head . OPTIONAL { ?head wdt:P18 ?img } }
+  OPTIONAL { ?country wdt:P1906 ?office }
+  OPTIONAL { ?country wdt:P122 ?gov }
+  SERVICE wikibase:label { bd:serviceParam wikibase:language "en". }
+}
+"""
+
+def build_country_facts():
+    """Runs the bulk SPARQL query and returns the snapshot dict (not yet saved)."""
+    res = http.get(
+        "https://query.wikidata.org/sparql",
+        params={"query": COUNTRY_FACTS_SPARQL, "format": "json"},
+        headers={"Accept": "application/sparql-results+json"},
+        timeout=(10, 120)
+    )
+    res.raise_for_status()
+
+    countries = {}
+    for row in res.json()["results"]["bindings"]:
+        value = lambda key: row.get(key, {}).get("value")
+        cc = value("iso2").upper()
+        entry = countries.setdefault(cc, {
+            "name": value("countryLabel"),
+            "population": value("pop"),
+            "populationDate": value("popDate"),
+            "head_of_state": value("headLabel"),
+            "stateTitle": value("officeLabel"),
+            "stateImage": value("img"),
+            "governmentType": [],
+        })
+        # Extra rows come from multi-valued properties; first value wins,
+        # except government types, which are all kept
+        for key, field in [("pop", "population"), ("popDate", "populationDate"), ("headLabel", "head_of_state"),
+                           ("officeLabel", "stateTitle"), ("img", "stateImage")]:
+            if entry[field] is None:
+                entry[field] = value(key)
+        gov = value("govLabel")
+        if gov and gov not in entry["governmentType"]:
+            entry["governmentType"].append(gov)
+
+    for entry in countries.values():
+        entry["governmentType"] = ", ".join(entry["governmentType"]) or None
+    return {
+        "built": now_iso(),
+        "countries": countries,
+        "names": {e["name"].lower(): cc for cc, e in countries.items() if e["name"]},
+    }
+
+country_facts = Snapshot(
+    COUNTRY_FACTS_PATH, build_country_facts,
+    max_age_days=float(COUNTRY_FACTS_MAX_AGE) if COUNTRY_FACTS_MAX_AGE else None
+)
+
+def get_country_data(country, cc=None):
+    """
+    Returns population (and its date), head of state (name, title, portrait)
+    and government type for a country, looked up by ISO alpha-2 code `cc`
+    or by English name in the country facts snapshot. Countries missing
+    from the snapshot fall back to the live lookup.
     """
-    Fetches:
+    facts = country_facts.get()
+    if facts:
+        code = (cc or facts["names"].get(country.lower(), "")).upper()
+        entry = facts["countries"].get(code)
+        if entry:
+            return {
+                "population": entry["population"],
+                "populationDate": entry["populationDate"],
+                "head_of_state": entry["head_of_state"],
+                "stateTitle": entry["stateTitle"] or "Head of state",
+                "stateImage": entry["stateImage"],
+                "governmentType": entry["governmentType"] or "Unknown"
+            }
+    return fetch_country_data(country)
+
+def fetch_country_data(country):
+    """
+    Fetches live, for one country:
       - Latest population and its date (via Wikidata SPARQL)
       - Head of state’s name and portrait image URL (via Wikidata SPARQL)
       - Head of state’s official title as it appears in the Wikipedia infobox
       - Government type from the Wikipedia infobox
     """
-    session = requests.Session()
-    session.headers.update({
-        "User-Agent": "CountryInfoBot/1.0 (contact@example.com)"
-    })
+    from bs4 import BeautifulSoup
 
     # 1. Get Wikidata ID from Wikipedia API
     wiki_api = "https://en.wikipedia.org/w/api.php"
@@ -24,7 +117,7 @@ def get_country_data(country):
         "prop": "pageprops",
         "ppprop": "wikibase_item"
     }
-    resp = session.get(wiki_api, params=params)
+    resp = http.get(wiki_api, params=params)
     resp.raise_for_status()
     pages = resp.json()["query"]["pages"]
     page = next(iter(pages.values()))
@@ -47,11 +140,8 @@ def get_country_data(country):
     LIMIT 1
     """
     sparql_url = "https://query.wikidata.org/sparql"
-    headers = {
-        "Accept": "application/sparql-results+json",
-        "User-Agent": "CountryInfoBot/1.0 (contact@example.com)"
-    }
-    data = session.get(sparql_url, params={"query": sparql, "format": "json"}, headers=headers)
+    headers = {"Accept": "application/sparql-results+json"}
+    data = http.get(sparql_url, params={"query": sparql, "format": "json"}, headers=headers)
     data.raise_for_status()
     results = data.json()["results"]["bindings"]
     if not results:
@@ -65,7 +155,7 @@ def get_country_data(country):
 
     # 3. Scrape infobox for head-of-state title and government type
     wiki_url = "https://en.wikipedia.org/wiki/" + country.replace(" ", "_")
-    html = session.get(wiki_url).text
+    html = http.get(wiki_url).text
     soup = BeautifulSoup(html, "lxml")
     infobox = soup.find("table", class_="infobox")
     
@@ -103,7 +193,7 @@ def get_image_from_wikidata(wikidata_id):
     Recebe um Wikidata ID (ex.: 'Q17592') e retorna a URL da imagem principal (P18)
     """
     url = f"https://www.wikidata.org/wiki/Special:EntityData/{wikidata_id}.json"
-    res = requests.get(url)
+    res = http.get(url)
     res.raise_for_status()
     entity = res.json()["entities"][wikidata_id]
 